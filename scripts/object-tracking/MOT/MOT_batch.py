@@ -0,0 +1,115 @@
+"""
+Headless batch generator for the pre-rendered MOT clips played by mot.js (MOT/videos, MOT/resp_img).
+
+Each trial is written as MOT_<targets>_<trial>/frame_00000.png ..., a numbered response image MOT_<targets>_<trial>.jpg
+in the style of resp_img, and MOT_<targets>_<trial>.json with the seed, parameters and target labels. Trials are
+spread over all CPU cores.
+
+    python MOT_batch.py --targets 2 3 --trials 12 --out generated
+    ffmpeg -framerate 30 -i generated/MOT_02_01/frame_%05d.png -pix_fmt yuv420p generated/MOT_02_01.mp4
+"""
+import os
+import json
+import argparse
+import multiprocessing
+from types import SimpleNamespace
+import pygame as pg
+from MOT_constants import *
+from MOT_trajectory import seeded_start, generate_trajectory, trajectory_params
+
+# == Colors as in messagescreens ==
+background_col = GREY
+label_col = RED
+
+
+def make_objects(n):
+    """function to make bare objects holding just the state the physics needs"""
+    return [SimpleNamespace(x=0.0, y=0.0, dx=0.0, dy=0.0, radius=obj_radius) for _ in range(n)]
+
+
+def draw_frame(surface, positions, targets, flash_on, cross):
+    """function to draw one frame of a trial onto surface"""
+    surface.fill(background_col)
+    if cross:
+        cx, cy = win_width / 2, win_height / 2
+        pg.draw.line(surface, BLACK, (cx - 7, cy), (cx + 7, cy), 3)
+        pg.draw.line(surface, BLACK, (cx, cy - 7), (cx, cy + 7), 3)
+    for k, (x, y) in enumerate(positions):
+        color = GREEN if flash_on and k in targets else WHITE
+        pg.draw.circle(surface, color, (int(x), int(y)), obj_radius)
+
+
+def number_objects(positions):
+    """labels 1..n given to the objects from left to right, as on the response images"""
+    order = sorted(range(len(positions)), key=lambda k: positions[k][0])
+    labels = [0] * len(positions)
+    for label, k in enumerate(order, 1):
+        labels[k] = label
+    return labels
+
+
+def render_trial(job):
+    """function to simulate and render one trial; runs in a worker process"""
+    n_targ, trial, seed, total, fps, out = job
+    name = "MOT_{:02d}_{:02d}".format(n_targ, trial)
+    frame_dir = os.path.join(out, name)
+    os.makedirs(frame_dir, exist_ok=True)
+
+    mlist = make_objects(total)
+    seeded_start(seed, mlist)
+    trajectory = generate_trajectory(mlist)
+    targets = list(range(total - n_targ, total))  # - targets come last, as in generate_list
+
+    pg.font.init()
+    surface = pg.Surface(win_dimension)
+    n_frames = int(Tani * fps)
+    for frame in range(n_frames + 1):
+        t = frame / fps
+        if t <= Tfl:  # - fixation, then flashing targets as MOTobj.flash_color does
+            positions = trajectory[0].tolist()
+            flash_on = Tfix < t and int((t - Tfix) * 2 * flash_rate) % 2 == 1
+        else:
+            positions = trajectory[min(int((t - Tfl) * physics_rate), len(trajectory) - 1)].tolist()
+            flash_on = False
+        draw_frame(surface, positions, targets, flash_on, t <= Tfl)
+        pg.image.save(surface, os.path.join(frame_dir, "frame_{:05d}.png".format(frame)))
+
+    # -- Response image: the final frame with red numbers beside every object
+    positions = trajectory[-1].tolist()
+    labels = number_objects(positions)
+    font = pg.font.SysFont("arial", large_font)
+    for (x, y), label in zip(positions, labels):
+        text = font.render(str(label), True, label_col)
+        surface.blit(text, (int(x) + obj_radius, int(y) - text.get_height() // 2))
+    pg.image.save(surface, os.path.join(out, name + ".jpg"))
+
+    meta = trajectory_params(seed)
+    meta.update({"name": name, "num_targ": n_targ, "num_distractor": total - n_targ, "fps": fps,
+                 "frames": n_frames + 1, "target_indices": targets,
+                 "target_labels": sorted(labels[k] for k in targets)})
+    with open(os.path.join(out, name + ".json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return name
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render MOT trials to frame sequences with metadata")
+    parser.add_argument("--targets", type=int, nargs="+", default=[2, 3], help="target counts to generate")
+    parser.add_argument("--trials", type=int, default=12, help="trials per target count")
+    parser.add_argument("--total", type=int, default=num_total, help="objects per trial, targets included")
+    parser.add_argument("--fps", type=int, default=30, help="frame rate of the rendered clips")
+    parser.add_argument("--seed", type=int, default=0, help="trial k with t targets uses seed + 1000 * t + k")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="generated")
+    args = parser.parse_args()
+
+    jobs = [(n_targ, trial, args.seed + 1000 * n_targ + trial, args.total, args.fps, args.out)
+            for n_targ in args.targets for trial in range(1, args.trials + 1)]
+    os.makedirs(args.out, exist_ok=True)
+    with multiprocessing.Pool(args.workers) as pool:
+        for name in pool.imap_unordered(render_trial, jobs):
+            print(name)
+
+
+if __name__ == "__main__":
+    main()
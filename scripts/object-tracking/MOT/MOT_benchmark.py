@@ -0,0 +1,212 @@
+"""
+Microbenchmarks of the MOT hot paths against the object count and radius: collisions (the per-object
+MOTobj.detect_collision loop, brownian_motion and the numpy engine with and without the spatial hash), placement
+(place_objects and MOTobj.shuffle_position), mouse hit-testing (MOTobj.in_circle and HitTester) and drawing
+(MOTobj.draw_circle, draw_objects and the dirty-rect renderer). Runs headless; MOT_RESOLUTION sets the window size.
+
+Every case reports ms per frame (one frame's worth of calls) and us per call. --save writes the results as a
+baseline; --baseline compares against one and exits with status 1 if any case got slower than --threshold times
+its baseline, so a lab machine or a change can be qualified before a study.
+
+    python MOT_benchmark.py --counts 8 32 128 512 --radii 20 35 --save baseline.json
+    python MOT_benchmark.py --baseline baseline.json --threshold 1.25
+"""
+import os
+os.environ.setdefault("MOT_HEADLESS", "1")  # no window needed to time the hot paths
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import numpy as np
+from MOT_exp_main import MOTobj
+from MOT_physics import PhysicsEngine, place_objects
+from MOT_input import HitTester
+from MOT_render import DirtyRenderer, draw_objects
+from MOT_constants import win_width, win_height, obj_radius, spd_unit, brownian_motion
+from messagescreens import win, sprite_cache, paint_background
+
+
+def make_objects(n, radius, seed):
+    """function to make n objects at random positions with random non-zero velocities"""
+    rng = np.random.default_rng(seed)
+    mlist = []
+    for _ in range(n):
+        obj = MOTobj()
+        obj.radius = radius
+        obj.x, obj.y = rng.uniform(radius, win_width - radius), rng.uniform(radius, win_height - radius)
+        obj.dx, obj.dy = rng.choice([-2, -1, 1]) * spd_unit, rng.choice([-2, -1, 1]) * spd_unit
+        mlist.append(obj)
+    return mlist
+
+
+# == Cases: each takes the objects and returns the work of one frame and how many calls it makes ==
+
+def case_detect_collision(mlist):
+    def frame():
+        for obj in mlist:
+            obj.detect_collision(mlist)
+    return frame, len(mlist)
+
+
+def case_brownian_motion(mlist):
+    pairs = list(zip(mlist, mlist[1:] + mlist[:1]))
+
+    def frame():
+        for a, b in pairs:
+            brownian_motion(a, b)
+    return frame, len(pairs)
+
+
+def engine_case(grid):
+    def case(mlist):
+        engine = PhysicsEngine(grid=grid)
+
+        def frame():
+            engine.pull(mlist)
+            engine.step()
+            engine.push(mlist)
+        return frame, 1
+    return case
+
+
+def case_place_objects(mlist):
+    radius, rng = mlist[0].radius, np.random.default_rng(0)
+    place_objects(len(mlist), radius, rng)  # - raises ValueError up front if the objects cannot fit
+    return lambda: place_objects(len(mlist), radius, rng), 1
+
+
+def case_shuffle_position(mlist):
+    def frame():
+        for obj in mlist:
+            obj.shuffle_position()
+    return frame, len(mlist)
+
+
+def case_in_circle(mlist):
+    def frame():
+        mx, my = random.randint(0, win_width), random.randint(0, win_height)
+        for obj in mlist:
+            obj.in_circle(mx, my)
+    return frame, len(mlist)
+
+
+def case_hit_test(mlist):
+    tester = HitTester()
+
+    def frame():
+        tester.update(mlist)
+        tester.at(random.randint(0, win_width), random.randint(0, win_height))
+    return frame, 1
+
+
+def case_draw_circle(mlist):
+    def frame():
+        for obj in mlist:
+            obj.draw_circle(win)
+    return frame, len(mlist)
+
+
+def case_draw_objects(mlist):
+    return lambda: draw_objects(win, mlist, sprite_cache), 1
+
+
+def case_renderer(mlist):
+    renderer = DirtyRenderer(win, sprite_cache, {"background": paint_background})
+    engine = PhysicsEngine()
+
+    def frame():
+        engine.pull(mlist)
+        engine.step()
+        engine.push(mlist)
+        renderer.draw(mlist)
+    return frame, 1
+
+
+cases = {
+    "detect_collision": case_detect_collision,
+    "brownian_motion": case_brownian_motion,
+    "engine": engine_case(False),
+    "engine_grid": engine_case(True),
+    "place_objects": case_place_objects,
+    "shuffle_position": case_shuffle_position,
+    "in_circle": case_in_circle,
+    "hit_test": case_hit_test,
+    "draw_circle": case_draw_circle,
+    "draw_objects": case_draw_objects,
+    "renderer": case_renderer,  # - physics step plus a dirty-rect frame, display update included
+}
+slow_cases = {"detect_collision": 3}  # - O(n^3) per frame; frame count override, skipped above --slow-max objects
+
+
+def run_case(case, n, radius, frames, seed):
+    """ms per frame and us per call of one case, or None if it does not apply at this size"""
+    mlist = make_objects(n, radius, seed)
+    try:
+        frame, calls = cases[case](mlist)
+    except ValueError:  # - e.g. n objects of this radius do not fit in the window
+        return None
+    frame()  # - warm up: sprite and layer caches, first numpy allocations
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        frame()
+    ms = (time.perf_counter() - t0) * 1000 / frames
+    return {"ms_per_frame": ms, "us_per_call": ms * 1000 / calls, "calls": calls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the MOT hot paths")
+    parser.add_argument("--counts", type=int, nargs="+", default=[8, 32, 128, 512])
+    parser.add_argument("--radii", type=int, nargs="+", default=[obj_radius])
+    parser.add_argument("--cases", nargs="+", default=list(cases), choices=list(cases))
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--slow-max", type=int, default=128, help="skip the O(n^3) legacy loop above this count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results to this baseline file")
+    parser.add_argument("--baseline", help="compare against this baseline file")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown against the baseline that fails")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results, regressions = {}, []
+    print("{:<17} {:>6} {:>6} {:>12} {:>12} {:>10}".format("case", "n", "radius", "ms/frame", "us/call", "vs base"))
+    for case in args.cases:
+        for n in args.counts:
+            for radius in args.radii:
+                if case in slow_cases and n > args.slow_max:
+                    continue
+                result = run_case(case, n, radius, slow_cases.get(case, args.frames), args.seed)
+                if result is None:
+                    print("{:<17} {:>6d} {:>6d} {:>12}".format(case, n, radius, "n/a"))
+                    continue
+                key = "{}/{:d}/{:d}".format(case, n, radius)
+                results[key] = result
+                ratio = ""
+                if key in baseline:
+                    ratio = result["ms_per_frame"] / baseline[key]["ms_per_frame"]
+                    if ratio > args.threshold:
+                        regressions.append(key)
+                    ratio = "{:.2f}x{}".format(ratio, " !" if ratio > args.threshold else "")
+                print("{:<17} {:>6d} {:>6d} {:>12.4f} {:>12.3f} {:>10}".format(
+                    case, n, radius, result["ms_per_frame"], result["us_per_call"], ratio))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"machine": {"platform": platform.platform(), "processor": platform.processor(),
+                                   "python": platform.python_version(), "window": [win_width, win_height]},
+                       "results": results}, f, indent=2)
+    if regressions:
+        print("{:d} case(s) slower than {:.2f}x the baseline: {}".format(
+            len(regressions), args.threshold, ", ".join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
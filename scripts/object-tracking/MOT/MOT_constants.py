@@ -1,8 +1,12 @@
+import os
 import math
 from random import randint, choice
 import time
 import pygame as pg
-from win32api import GetSystemMetrics
+try:
+    from win32api import GetSystemMetrics
+except ImportError:  # - not on Windows; the resolution comes from MOT_RESOLUTION or the default below
+    GetSystemMetrics = None
 
 
 """
@@ -12,6 +16,10 @@ obj_radius: int = 35  # size of balls in pixels
 num_distractor = 6  # number of distractor objects
 num_targ = 2  # number of target objects
 num_total = num_distractor + num_targ
+vectorized_physics = True  # step all objects at once with MOT_physics instead of MOTobj.detect_collision
+spatial_hash = False  # only test neighbouring grid cells for collisions; pays off past ~50 objects
+legacy_collisions = True  # colliding objects keep their speed and head away from each other; False bounces them elastically
+precompute_trajectories = True  # simulate each trial's motion before it starts and play it back during animation
 
 """
 Define the times and durations in SECONDS
@@ -25,13 +33,26 @@ animation_time = Tani = flash_time + 30  # time for objects to move around in se
 answer_time = Tans = animation_time + 60  # time limit to make answer
 
 feedback_time = 1
+
+flash_rate = 9  # green flashes per second; what the old per-frame counter gave at 144 FPS with 6 distractors
 """
 Define the project display window
 """
 title = "Multiple Object Tracking Experiment"
-win_width = GetSystemMetrics(0)  # width of the user screen
-win_height = GetSystemMetrics(1) 
+headless = os.environ.get("MOT_HEADLESS", "") not in ("", "0")  # render offscreen, e.g. on a server with no monitor
+resolution = os.environ.get("MOT_RESOLUTION")  # "WIDTHxHEIGHT" overrides the user screen size
+capture_dir = os.environ.get("MOT_CAPTURE")  # save every presented frame as a PNG into this directory
+if resolution:
+    win_width, win_height = map(int, resolution.lower().split("x"))
+elif GetSystemMetrics is not None:
+    win_width = GetSystemMetrics(0)  # width of the user screen
+    win_height = GetSystemMetrics(1)
+else:
+    win_width, win_height = 1920, 1080
 win_dimension = (win_width, win_height)
+idle_timeout = 100  # ms; while nothing moves the trial loop sleeps on the event queue for at most this long
+dirty_rects = True  # during fixation, flash and animation only redraw and push the regions the objects touch
+antialias_circles = False  # smooth circle edges; the circles are pre-rendered, so this costs nothing per frame
 
 """win_width, win_height = 1920, 1080  # pixels; width of screen
 win_dimension = (win_width, win_height)"""
@@ -112,6 +133,44 @@ listX, listY = [], []
 rangeX, rangeY = range(boundary['left'], boundary['right']), range(boundary['up'], boundary['down'])
 
 min_spd, max_spd = -2, 2
+spd_unit = 144  # px/s per unit of speed; the speed range was tuned as pixels per frame at 144 FPS
+trial_speeds = [spd * spd_unit for spd in range(min_spd, max_spd) if spd != 0]  # velocities seeded trials draw from
+
+"""
+Define the fixed physics timestep; motion advances in steps of physics_dt no matter how many frames are drawn
+"""
+physics_rate = 144  # physics steps per second
+physics_dt = 1 / physics_rate
+
+"""
+Define the frame pacer; it sleeps until pacer_spin seconds before each frame deadline and spin-waits the rest
+"""
+pacer_spin = 0.001  # least margin; grows by itself when the OS oversleeps by more than this
+pacer_spin_decay = 0.98  # per frame; after an oversleep the margin shrinks back toward pacer_spin
+frame_buffer_size = 16384  # frames of timing kept by the frame recorder; a whole trial at 144 FPS takes ~4700
+
+"""
+Define the stage profiler; set MOT_PROFILE=1 to time the stages of every frame from the start, or press F9 to toggle
+it. MOT_PROFILE_TRIAL=k runs cProfile over real trial k
+"""
+profile_env = "MOT_PROFILE"
+profile_trial_env = "MOT_PROFILE_TRIAL"
+profile_key = pg.K_F9
+
+"""
+Define trial seeding and the trajectory cache; real trial k starts from seed trial_seed_base + k so every station
+shows the same stimuli, None draws unseeded trials
+"""
+trial_seed_base = 0
+trajectory_cache_dir = "trajectory_cache"
+trajectory_cache_mb = 512  # least recently used trajectories are deleted past this size
+record_trajectories = False  # save the object positions of every animation frame of the real trials, per trial
+
+"""
+Define when the session logs are forced to disk; they are written by a background thread and always flushed on exit
+"""
+log_sync_trial = True  # fsync after every trial
+log_sync_interval = 5  # seconds; rows written since the last fsync are synced at least this often, None to not
 
 """
 Define session information for recording purposes
@@ -122,44 +181,12 @@ date_string = time.strftime("%b_%d_%H%M", time.localtime())  # add the current t
 
 def brownian_motion(C1, C2):
     """ ===== FUNCTION TO CALCULATE BROWNIAN MOTION ===== """
+    # -- C1 keeps its speed and heads straight away from C2; MOT_physics.collision_response does this for all pairs
     c1_spd = math.sqrt((C1.dx ** 2) + (C1.dy ** 2))
-    
-    diff_x = -(C1.x - C2.x)
-    diff_y = -(C1.y - C2.y)
-    vel_x = 0
-    vel_y = 0
-    if diff_x > 0:
-        if diff_y > 0:
-            angle = math.degrees(math.atan(diff_y / diff_x))
-            vel_x = -c1_spd * math.cos(math.radians(angle))
-            vel_y = -c1_spd * math.sin(math.radians(angle))
-        elif diff_y < 0:
-            angle = math.degrees(math.atan(diff_y / diff_x))
-            vel_x = -c1_spd * math.cos(math.radians(angle))
-            vel_y = -c1_spd * math.sin(math.radians(angle))
-    elif diff_x < 0:
-        if diff_y > 0:
-            angle = 180 + math.degrees(math.atan(diff_y / diff_x))
-            vel_x = -c1_spd * math.cos(math.radians(angle))
-            vel_y = -c1_spd * math.sin(math.radians(angle))
-        elif diff_y < 0:
-            angle = -180 + math.degrees(math.atan(diff_y / diff_x))
-            vel_x = -c1_spd * math.cos(math.radians(angle))
-            vel_y = -c1_spd * math.sin(math.radians(angle))
-    elif diff_x == 0:
-        if diff_y > 0:
-            angle = -90
-        else:
-            angle = 90
-        vel_x = c1_spd * math.cos(math.radians(angle))
-        vel_y = c1_spd * math.sin(math.radians(angle))
-    elif diff_y == 0:
-        if diff_x < 0:
-            angle = 0
-        else:
-            angle = 180
-        vel_x = c1_spd * math.cos(math.radians(angle))
-        vel_y = c1_spd * math.sin(math.radians(angle))
-    C1.dx = vel_x
-    C1.dy = vel_y
+    if C1.x == C2.x and C1.y == C2.y:
+        angle = math.pi / 2
+    else:
+        angle = math.atan2(C1.y - C2.y, C1.x - C2.x)
+    C1.dx = c1_spd * math.cos(angle)
+    C1.dy = c1_spd * math.sin(angle)
  
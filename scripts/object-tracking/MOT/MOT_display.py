@@ -0,0 +1,43 @@
+import os
+import pygame as pg
+from MOT_constants import win_dimension, title, headless
+
+# == Functions called with (surface, rects) after every presented frame; rects is None when the whole window was ==
+capture_hooks = []
+
+
+def open_display(size=win_dimension, offscreen=headless, pos=(50, 50)):
+    """function to open the experiment window full screen, or with offscreen on, an offscreen surface of the given
+    size on the SDL dummy video driver; everything else draws and presents the same way either way"""
+    if offscreen:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        flags = 0
+    else:
+        os.environ['SDL_VIDEO_WINDOW_POS'] = "%d,%d" % pos
+        flags = pg.FULLSCREEN
+    display = pg.display.set_mode(size, flags)
+    pg.display.set_caption(title)
+    return display
+
+
+def present(rects=None):
+    """function to push the drawn frame to the screen, the whole window or only rects, then run the capture hooks"""
+    if rects is None:
+        pg.display.flip()
+    else:
+        pg.display.update(rects)
+    for hook in capture_hooks:
+        hook(pg.display.get_surface(), rects)
+
+
+class FrameCapture:
+    """capture hook saving every presented frame as frame_00000.png, frame_00001.png, ... in directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, surface, rects):
+        pg.image.save(surface, os.path.join(self.directory, "frame_{:05d}.png".format(self.count)))
+        self.count += 1
@@ -2,7 +2,12 @@
 import sys
 # from MOT_constants import *
 from messagescreens import  *
-from psychopy.gui import DlgFromDict
+from MOT_trajectory import trial_trajectory, TrajectoryRecorder
+from MOT_physics import place_objects
+from MOT_log import AsyncWriter
+from MOT_text import preload_fonts
+from MOT_input import frame_input
+from MOT_timing import FramePacer, FrameRecorder, WallClock
 from random import randint, choice
 
 # == Trial variables ==
@@ -12,6 +17,9 @@ n_prac = 2
 
 # == Processing power or frames per second ==
 FPS = 144
+frame_pacer = FramePacer(FPS)
+frame_recorder = FrameRecorder(FPS)
+wall_clock = WallClock(frame_pacer)  # - trial loops take a VirtualClock instead to run faster than real time
 
 
 class MOTobj:
@@ -19,21 +27,17 @@ class MOTobj:
         # -- Radius of the circle objects
         self.radius = obj_radius
 
-        # -- Object positions attributes
-        self.x, self.y = choice([n for n in range(int(boundary["left"]), int(boundary["right"]))
-                                 if n not in range(x - self.radius, x + self.radius)]), \
-                         choice([n for n in range(int(boundary["up"]), int(boundary["down"]))
-                                 if n not in range(y - self.radius, y + self.radius)])
-        # -- Velocity set so that it's random within a range but NOT ZERO
-        self.dx, self.dy = choice([dx for dx in range(min_spd, max_spd) if dx not in [0]]), \
-                           choice([dy for dy in range(min_spd, max_spd) if dy not in [0]])
+        # -- Object positions attributes; generate_list spreads the whole list out with shuffle_positions
+        self.x, self.y = randint(boundary["left"], boundary["right"]), randint(boundary["up"], boundary["down"])
+        # -- Velocity in px/s set so that it's random within a range but NOT ZERO
+        self.dx, self.dy = choice([dx for dx in range(min_spd, max_spd) if dx not in [0]])*spd_unit, \
+                           choice([dy for dy in range(min_spd, max_spd) if dy not in [0]])*spd_unit
 
         # -- Set the circle object neutral state color
         self.color = default_color
         self.default_color = default_color
 
-        # -- Timer attributes
-        self.timer = 0
+        # -- Flash state attribute
         self.flash = True
 
         # -- State attributes for mouse selection control
@@ -46,7 +50,7 @@ class MOTobj:
 
     def in_circle(self, mouse_x, mouse_y):
         # -- Return boolean value depending on mouse position, if it is in circle or not
-        if math.sqrt(((mouse_x - self.x) ** 2) + ((mouse_y - self.y) ** 2)) < self.radius:
+        if (mouse_x - self.x) ** 2 + (mouse_y - self.y) ** 2 < self.radius ** 2:
             return True
         else:
             return False
@@ -76,9 +80,9 @@ class MOTobj:
             self.isSelected = True
 
     def detect_collision(self, mlist):
-        # -- Object positions in x and y coordinates change in velocity value
-        self.x += self.dx
-        self.y += self.dy
+        # -- Object positions in x and y coordinates change by one physics step of the velocity
+        self.x += self.dx * physics_dt
+        self.y += self.dy * physics_dt
         # -- If the object reaches the window boundary, bounce back
         if self.x < self.radius or self.x > win_width-self.radius:
             self.dx *= -1
@@ -94,16 +98,13 @@ class MOTobj:
                         brownian_motion(a, b)
 
     def draw_circle(self, display=win):
-        # -- Function to draw circle onto display
-        pg.draw.circle(display, self.color, (int(self.x), int(self.y)), self.radius)
+        # -- Function to draw circle onto display from the pre-rendered sprites; returns the rect drawn over
+        sprite = sprite_cache.get(self.radius, self.color)
+        return display.blit(sprite, (int(self.x) - self.radius, int(self.y) - self.radius))
 
-    def flash_color(self):
-        # -- Function to flash color
-        if self.timer == FPS:
-            self.timer = 0
-            self.flash = not self.flash
-
-        self.timer += 3
+    def flash_color(self, elapsed):
+        # -- Function to flash color; alternates default and GREEN flash_rate times a second, from elapsed seconds
+        self.flash = int(elapsed * 2 * flash_rate) % 2 == 0
 
         if self.flash:
             self.color = self.default_color
@@ -112,10 +113,14 @@ class MOTobj:
 
     def shuffle_position(self):
         """Shuffle the position of circles"""
-        self.x = choice([n for n in range(int(boundary["left"]), int(boundary["right"]))
-                         if n not in range(x - self.radius, x + self.radius)])
-        self.y = choice([n for n in range(int(boundary["up"]), int(boundary["down"]))
-                         if n not in range(y - self.radius, y + self.radius)])
+        self.x, self.y = randint(boundary["left"], boundary["right"]), randint(boundary["up"], boundary["down"])
+
+
+def shuffle_positions(mlist):
+    """function to shuffle the positions of all circles at once so that none of them overlap"""
+    xs, ys = place_objects(len(mlist))
+    for obj, x, y in zip(mlist, xs.tolist(), ys.tolist()):
+        obj.x, obj.y = x, y
 
 
 def generate_list(color):
@@ -130,12 +135,13 @@ def generate_list(color):
         t = MOTobj(color)
         target_list.append(t)
 
+    shuffle_positions(distractor_list + target_list)
     return distractor_list, target_list
 
 
-def delay(t):
-    """function to stop all processes for a time"""
-    pg.time.delay((t*1000))  # multiply by a thousand because the delay function takes milliseconds
+def delay(t, clock=wall_clock):
+    """function to stop all processes for a time, in seconds; a virtual clock just moves on"""
+    clock.sleep(t)
 
 
 def record_response(response_time, response_score, time_out_state, log):
@@ -149,7 +155,16 @@ def record_response(response_time, response_score, time_out_state, log):
     log.write(header_line)
 
 
-def guide_user(master_list, distractor_list, target_list):
+def record_timing(block, trial, frames, log):
+    # record the frame timing of the trial, one line per phase; block is guide, practice or real
+    for row in frames.summary():
+        log.write("{},{:d},{phase},{frames:d},{mean_fps:.2f},{mean_ms:.3f},{p95_ms:.3f},{p99_ms:.3f},{max_ms:.3f},"
+                  "{dropped:d}\n".format(block, trial, **row))
+    log.end_trial()
+
+
+def guide_user(master_list, distractor_list, target_list, timing_log=None):
+    """function for the guided walkthrough of a trial; its frame timing goes to timing_log if given"""
 
     timeup = False
     submitted = False
@@ -171,18 +186,26 @@ def guide_user(master_list, distractor_list, target_list):
     guide_screen("present", master_list, STL)
     wait_key()
 
+    renderer.invalidate()
+    frame_pacer.reset()
     t0 = pg.time.get_ticks()
+    frame_recorder.start_trial()
 
     while True:
-        pg.time.Clock().tick_busy_loop(FPS)  # =Set FPS
+        frame_pacer.tick()  # =Set FPS
+        profiler.start("input")
+        events = pg.event.get()
 
-        win.fill(background_col)  # =fill background with background color
+        if not dirty_rects:
+            win.fill(background_col)  # =fill background with background color; the renderer erases for itself
         mx, my = pg.mouse.get_pos()  # =get x and y coord of mouse cursor on window
+        hit_tester.update(master_list)
+        hovered = hit_tester.at(mx, my)  # =index of the object under the cursor, -1 if none
 
         selected_list = STL = []  # - list for all selected objects
         selected_targ = []  # - list for all SELECTED TARGETS
 
-        for event in pg.event.get():
+        for event in frame_input(events, master_list, hovered):
             if event.type == pg.QUIT:
                 pg.quit()
                 sys.exit()
@@ -190,6 +213,8 @@ def guide_user(master_list, distractor_list, target_list):
                 if event.key == pg.K_ESCAPE:
                     pg.quit()
                     sys.exit()
+                if event.key == profile_key:
+                    profiler.toggle()
                 if event.key == pg.K_SPACE:
                     if animating:
                         for target in target_list:
@@ -204,40 +229,22 @@ def guide_user(master_list, distractor_list, target_list):
                         else:
                             need_to_select_4 = True
 
-            for obj in master_list:
-                if obj.in_circle(mx, my):
-                    if event.type == pg.MOUSEMOTION:
-                        if not obj.isClicked and not obj.isSelected:
-                            obj.state_control("hovered")
-                    if event.type == pg.MOUSEBUTTONDOWN:
-                        if not obj.isClicked and not obj.isSelected:
-                            obj.state_control("clicked")
-
-                        if not obj.isClicked and obj.isSelected:
-                            obj.state_control("neutral")
-                    if event.type == pg.MOUSEBUTTONUP:
-                        if obj.isClicked and not obj.isSelected:
-                            obj.state_control("selected")
-
-                elif not obj.in_circle(mx, my):
-                    if event.type == pg.MOUSEMOTION:
-                        if not obj.isClicked and not obj.isSelected:
-                            obj.state_control("neutral")
-                    if event.type == pg.MOUSEBUTTONUP:
-                        if obj.isClicked and not obj.isSelected:
-                            obj.state_control("neutral")
-
+        profiler.stop("input")
         t1 = pg.time.get_ticks()
         dt = (t1 - t0)/1000
 
         if animating:
             if dt < Tfl - Tfix:
-                flash_targets(distractor_list, target_list)
+                flash_targets(distractor_list, target_list, dt)
+                frame_recorder.mark("flash")
             elif Tfl - Tfix <= dt < Tani - Tfl:
                 for t in target_list:
                     t.state_control("neutral")  # this resets target color to match distractor's
-                animate(distractor_list, target_list, master_list)
+                animate(distractor_list, target_list, master_list, elapsed=dt - (Tfl - Tfix))
+                frame_recorder.mark("animate")
             elif Tani - Tfl <= dt < Tans - Tani:
+                if dirty_rects:
+                    win.fill(background_col)  # - the answer screen is drawn whole, over the renderer's frames
                 if need_to_select_4:
                     message_screen("not_selected_4")
                 guide_screen("answer", master_list, selected_targ)
@@ -250,20 +257,24 @@ def guide_user(master_list, distractor_list, target_list):
             guiding = False
         if submitted:
             guide_screen("submitted", master_list, STL)
+            shuffle_positions(master_list)
             for obj in master_list:
-                obj.shuffle_position()
                 obj.state_control("neutral")
             delay(feedback_time)
             guiding = False
         if not guiding:
+            if timing_log:
+                record_timing("guide", 0, frame_recorder, timing_log)
             guide_screen("finished", master_list, STL)
             wait_key()
             need_to_select_4 = False
             break
 
 
-def practice_trials(master_list, distractor_list, target_list, CPT):
-    """function for practice trials; goes through all the protocols but does not record subject responses"""
+def practice_trials(master_list, distractor_list, target_list, CPT, vectorized=vectorized_physics,
+                    clock=wall_clock, timing_log=None):
+    """function for practice trials; goes through all the protocols but does not record subject responses, only the
+    frame timing of each trial to timing_log if given. Time is read from clock"""
     completed_practice_trial_count = CPT
 
     # == Variables for controlling protocols ==
@@ -272,21 +283,39 @@ def practice_trials(master_list, distractor_list, target_list, CPT):
     need_to_select_4 = False
     timeup = False
 
+    # == Motion of the first trial, simulated before it starts
+    trajectory = trial_trajectory(master_list)
+
     # == Timer
-    t0 = pg.time.get_ticks()
+    idle = False  # - waiting on input in the response phase
+    response_drawn = None  # - what the response screen shows
+    renderer.invalidate()
+    frame_pacer.reset()
+    t0 = clock.ticks()
+    frame_recorder.start_trial()
 
     # == Main loop
     while True:
-        pg.time.Clock().tick_busy_loop(FPS)  # =Set FPS
+        if idle and not clock.virtual:  # - nothing moves in the response phase; sleep until there is input
+            events = wait_events()
+            frame_pacer.restart()
+        else:
+            clock.frame()  # =Set FPS
+            events = []
+        profiler.start("input")
+        events += pg.event.get()  # - the queue is read inside the input stage in every loop
 
-        win.fill(background_col)  # =fill background with background color
+        if not dirty_rects:
+            win.fill(background_col)  # =fill background with background color; the renderer erases for itself
         mx, my = pg.mouse.get_pos()  # =get x and y coord of mouse cursor on window
+        hit_tester.update(master_list)
+        hovered = hit_tester.at(mx, my)  # =index of the object under the cursor, -1 if none
 
         selected_list = []  # - list for all selected objects
         selected_targ = []  # - list for all SELECTED TARGETS
 
         # -- Quit controller
-        for event in pg.event.get():
+        for event in frame_input(events, master_list, hovered):
             if event.type == pg.QUIT:
                 pg.quit()
                 sys.exit()
@@ -294,6 +323,8 @@ def practice_trials(master_list, distractor_list, target_list, CPT):
                 if event.key == pg.K_ESCAPE:
                     pg.quit()
                     sys.exit()
+                if event.key == profile_key:
+                    profiler.toggle()
 
                 # -- Answer submission controller
                 if event.key == pg.K_SPACE:
@@ -312,81 +343,71 @@ def practice_trials(master_list, distractor_list, target_list, CPT):
                         else:  # if user selects more or less than there are targets,
                             need_to_select_4 = True  # remind them to select the same number as there are targets
 
-            for obj in master_list:
-                if obj.in_circle(mx, my):  # -- If the mouse is within the circle
-                    if event.type == pg.MOUSEMOTION:
-                        if not obj.isClicked and not obj.isSelected:
-                            obj.state_control("hovered")
-                            # print("Clicked state: ", obj.isClicked, "Selected state: ", obj.isSelected)
-                    if event.type == pg.MOUSEBUTTONDOWN:
-                        if not obj.isClicked and not obj.isSelected:
-                            obj.state_control("clicked")
-                        if not obj.isClicked and obj.isSelected:
-                            obj.state_control("neutral")
-                    if event.type == pg.MOUSEBUTTONUP:
-                        if obj.isClicked and not obj.isSelected:
-                            obj.state_control("selected")
-
-                elif not obj.in_circle(mx, my):
-                    if event.type == pg.MOUSEMOTION:
-                        if not obj.isClicked and not obj.isSelected:
-                            obj.state_control("neutral")
-                    if event.type == pg.MOUSEBUTTONUP:
-                        if obj.isClicked and not obj.isSelected:
-                            obj.state_control("neutral")
-
         # == Timer to calculate elapsed time ==
-        t1 = pg.time.get_ticks()
+        profiler.stop("input")
+        t1 = clock.ticks()
         dt = (t1 - t0)/1000
 
         if completed_practice_trial_count < n_prac:  # if the completed trial count is less than total trial count
             if not reset:  # normal state; return to this state if reset is passed, or is supposed to run
                 if dt <= Tfix:  # fixation time
                     fixation_screen(master_list)
+                    frame_recorder.mark("fixation")
                 elif Tfix < dt <= Tfl:  # flash targets
-                    flash_targets(distractor_list, target_list)
+                    flash_targets(distractor_list, target_list, dt - Tfix)
+                    frame_recorder.mark("flash")
                 elif Tfl < dt <= Tani:  # animate/move the circles around the screen
                     for targ in target_list:
                         targ.state_control("neutral")
-                    animate(distractor_list, target_list, master_list)
+                    animate(distractor_list, target_list, master_list, vectorized, dt - Tfl, trajectory)
+                    frame_recorder.mark("animate")
                 elif Tani < dt <= Tans:  # stop moving the circles
-                    if need_to_select_4:
-                        message_screen("not_selected_4")
-                    static_draw(master_list)
-                    pg.display.flip()
+                    response_drawn = response_screen(master_list, need_to_select_4, response_drawn)
+                    idle = True
                 elif Tans < dt:  # timed out
                     timeup = True
 
             if submitted:  # if user successfully submits answer
                 win.fill(background_col)
                 msg_to_screen_centered("{:d} out of {:d} correct".format(len(selected_targ), len(selected_list)), BLACK, large_font)
-                pg.display.flip()
-                delay(feedback_time)
+                present()
+                delay(feedback_time, clock)
                 reset = True
 
             if timeup:  # if timed out, run this protocol
                 message_screen("timeup")
-                delay(feedback_time)
+                delay(feedback_time, clock)
                 reset = True
 
             if reset:  # reset state to reset the whole trial
+                if timing_log:
+                    record_timing("practice", completed_practice_trial_count, frame_recorder, timing_log)
+                shuffle_positions(master_list)
+                renderer.invalidate()
                 for obj in master_list:
-                    obj.shuffle_position()
                     obj.state_control("neutral")
                 completed_practice_trial_count += 1
                 submitted = timeup = need_to_select_4 = reset = False
-                t0 = t1
+                idle, response_drawn = False, None
+                if completed_practice_trial_count < n_prac:  # - no trajectory after the last trial
+                    trajectory = trial_trajectory(master_list)
+                frame_pacer.restart()
+                t0 = clock.ticks()  # start timing after the feedback delay and the trajectory are done
+                frame_recorder.start_trial()
         else:  # if the user completes all the intended trial number
             win.fill(background_col)
             message_screen("prac_finished")
-            pg.display.flip()
-            wait_key()
+            present()
+            if not clock.virtual:  # - nobody to press the key
+                wait_key()
             break
 
 
-def real_trials(master_list, distractor_list, target_list, CRT, recorder):
+def real_trials(master_list, distractor_list, target_list, CRT, recorder, vectorized=vectorized_physics,
+                timing_log=None, clock=wall_clock, trajectory_log=None):
     """function for real trials to record answer score, time and timed out state; same as practice trial except
-    the user responses are recorded"""
+    the user responses are recorded, the frame timing of each trial to timing_log and the object positions of every
+    animation frame to trajectory_log if given. Time is read from clock"""
 
     completed_practice_trial_count = CRT
 
@@ -395,17 +416,36 @@ def real_trials(master_list, distractor_list, target_list, CRT, recorder):
     need_to_select_4 = False
     timeup = False
 
-    t0 = pg.time.get_ticks()
+    trajectory = trial_trajectory(master_list, completed_practice_trial_count)
+    idle = False  # - waiting on input in the response phase
+    response_drawn = None  # - what the response screen shows
+    renderer.invalidate()
+    frame_pacer.reset()
+    t0 = clock.ticks()
+    frame_recorder.start_trial()
+    profiler.start_trial(completed_practice_trial_count)
+    t_stop = clock.ns() + int(animation_time * 1e9)  # =planned motion stop; measured at its flip
     while True:
-        pg.time.Clock().tick_busy_loop(FPS)  # =Set FPS
-
-        win.fill(background_col)  # =fill background with background color
+        if idle and not clock.virtual:  # - nothing moves in the response phase; sleep until there is input
+            events = wait_events()
+            frame_pacer.restart()
+        else:
+            clock.frame()  # =Set FPS
+            events = []
+        profiler.start("input")
+        events += pg.event.get()  # - the queue is read inside the input stage in every loop
+        t_events = clock.ns()  # =when this frame's events were taken off the queue
+
+        if not dirty_rects:
+            win.fill(background_col)  # =fill background with background color; the renderer erases for itself
         mx, my = pg.mouse.get_pos()  # =get x and y coord of mouse cursor on window
+        hit_tester.update(master_list)
+        hovered = hit_tester.at(mx, my)  # =index of the object under the cursor, -1 if none
 
         selected_list = []  # - list for all selected objects
         selected_targ = []  # - list for all SELECTED TARGETS
 
-        for event in pg.event.get():
+        for event in frame_input(events, master_list, hovered):
             if event.type == pg.QUIT:
                 pg.quit()
                 sys.exit()
@@ -413,6 +453,8 @@ def real_trials(master_list, distractor_list, target_list, CRT, recorder):
                 if event.key == pg.K_ESCAPE:
                     pg.quit()
                     sys.exit()
+                if event.key == profile_key:
+                    profiler.toggle()
                 if event.key == pg.K_SPACE:
                     if not reset:
                         for target in target_list:
@@ -426,88 +468,91 @@ def real_trials(master_list, distractor_list, target_list, CRT, recorder):
                         if len(selected_list) == num_targ:
                             submitted = True
                             # print("Answer submitted")
-                            t_keypress = pg.time.get_ticks()
+                            t_keypress = t_events
                         else:
                             need_to_select_4 = True
 
-            for obj in master_list:
-                if obj.in_circle(mx, my):
-                    if event.type == pg.MOUSEMOTION:
-                        if not obj.isClicked and not obj.isSelected:
-                            obj.state_control("hovered")
-                    if event.type == pg.MOUSEBUTTONDOWN:
-                        if not obj.isClicked and not obj.isSelected:
-                            obj.state_control("clicked")
-                        if not obj.isClicked and obj.isSelected:
-                            obj.state_control("neutral")
-
-                    if event.type == pg.MOUSEBUTTONUP:
-                        if obj.isClicked and not obj.isSelected:
-                            obj.state_control("selected")
-
-                elif not obj.in_circle(mx, my):
-                    if event.type == pg.MOUSEMOTION:
-                        if not obj.isClicked and not obj.isSelected:
-                            obj.state_control("neutral")
-                    if event.type == pg.MOUSEBUTTONUP:
-                        if obj.isClicked and not obj.isSelected:
-                            obj.state_control("neutral")
-
-        t1 = pg.time.get_ticks()
+        profiler.stop("input")
+        t1 = clock.ticks()
         dt = (t1 - t0)/1000
 
         if completed_practice_trial_count < n_real:
             if not reset:
                 if dt <= Tfix:
                     fixation_screen(master_list)
+                    frame_recorder.mark("fixation")
                 elif Tfix < dt <= Tfl:
-                    flash_targets(distractor_list, target_list)
+                    flash_targets(distractor_list, target_list, dt - Tfix)
+                    frame_recorder.mark("flash")
                 elif Tfl < dt <= Tani:
                     for targ in target_list:
                         targ.state_control("neutral")
-                    animate(distractor_list, target_list, master_list)
+                    animate(distractor_list, target_list, master_list, vectorized, dt - Tfl, trajectory)
+                    frame_recorder.mark("animate")
+                    if trajectory_log:
+                        trajectory_log.mark(master_list, dt - Tfl)
                 elif Tani < dt <= Tans:
-                    if need_to_select_4:
-                        message_screen("not_selected_4")
-                    static_draw(master_list)
-                    pg.display.flip()
-                    t_stop = pg.time.get_ticks()
+                    if response_drawn is None:  # - first static frame; response times count from its flip
+                        response_drawn = response_screen(master_list, need_to_select_4)
+                        t_stop = clock.ns()
+                    else:
+                        response_drawn = response_screen(master_list, need_to_select_4, response_drawn)
+                    idle = True
                 elif Tans < dt:
                     timeup = True
 
             if submitted:
-                t_sub = ((t_keypress - t0)/1000) - animation_time
+                t_sub = round((t_keypress - t_stop) / 1e9, 6)  # =seconds from the motion stop, to the microsecond
                 record_response(t_sub, len(selected_targ), False, recorder)
                 win.fill(background_col)
                 msg_to_screen_centered("{:d} out of {:d} correct".format(len(selected_targ), len(selected_list)), BLACK, large_font)
-                pg.display.flip()
-                delay(feedback_time)
+                present()
+                delay(feedback_time, clock)
                 reset = True
 
             if timeup:
                 record_response("timed out", "timed out", True, recorder)
                 message_screen("timeup")
-                delay(feedback_time)
+                delay(feedback_time, clock)
                 reset = True
 
             if reset:
+                profiler.end_trial(completed_practice_trial_count)
+                recorder.end_trial()
+                if timing_log:
+                    record_timing("real", completed_practice_trial_count, frame_recorder, timing_log)
+                if trajectory_log:
+                    trajectory_log.end_trial(completed_practice_trial_count, [obj in target_list for obj in master_list])
                 print(completed_practice_trial_count)
+                shuffle_positions(master_list)
+                renderer.invalidate()
                 for obj in master_list:
-                    obj.shuffle_position()
                     obj.state_control("neutral")
                 completed_practice_trial_count += 1
                 submitted = timeup = need_to_select_4 = reset = False
+                idle, response_drawn = False, None
                 # timeup = False
                 # need_to_select_4 = False
                 # reset = False
-                t0 = t1
+                if completed_practice_trial_count < n_real:  # - no trajectory or cache file after the last trial
+                    trajectory = trial_trajectory(master_list, completed_practice_trial_count)
+                frame_pacer.restart()
+                t0 = clock.ticks()  # start timing after the feedback delay and the trajectory are done
+                frame_recorder.start_trial()
+                profiler.start_trial(completed_practice_trial_count)
+                t_stop = clock.ns() + int(animation_time * 1e9)
 
         else:
             win.fill(background_col)
             message_screen("exp_finished")
-            pg.display.flip()
-            wait_key()
+            present()
+            if not clock.virtual:  # - nobody to press the key
+                wait_key()
             recorder.close()
+            if timing_log:
+                timing_log.close()
+            if trajectory_log:
+                trajectory_log.close()
             break
 
 
@@ -523,30 +568,38 @@ def main():
     list_m = list_d + list_t
 
     # == Dialogue box to enter participant information ==
+    from psychopy.gui import DlgFromDict  # - imported here so MOT_benchmark can import MOTobj without psychopy
     dlg_box = DlgFromDict(session_info, title="Multiple Object Tracking", fixed=["date"])
     if dlg_box.OK:  # - If participant information has been entered
         print(session_info)
 
         # == Prepare a CSV file ==
         mot_log = date_string + ' pcpnt_' + session_info['Participant'] + '_obsvr_' + session_info['Observer']
-        log = open(mot_log + '.csv', 'w')
+        log = AsyncWriter(mot_log + '.csv')  # - written off the frame loop, and flushed however the session ends
         header = ["response_time", "response_score", "timed_out"]
         delim = ",".join(header)
         delim += "\n"
         log.write(delim)
+        timing_log = AsyncWriter(mot_log + '_timing.csv')
+        profiler.prefix = mot_log  # - the stage table and cProfile dumps are written next to the CSV
+        trajectory_log = TrajectoryRecorder(mot_log + '_trajectories') if record_trajectories else None
+        timing_log.write("block,trial,phase,frames,mean_fps,mean_ms,p95_ms,p99_ms,max_ms,dropped\n")
 
         # == Initiate pygame ==
         pg.init()
+        preload_fonts([large_font, med_font, small_font])
 
         # == Start guide ==
-        #guide_user(list_m, list_d, list_t)
+        #guide_user(list_m, list_d, list_t, timing_log=timing_log)
 
         # == Start practice ==
 
-        practice_trials(list_m, list_d, list_t, completed_practice_trials)
+        practice_trials(list_m, list_d, list_t, completed_practice_trials, timing_log=timing_log)
 
         # == Start real trials, recording responses ==
-        real_trials(list_m, list_d, list_t, completed_real_trials, log)
+        real_trials(list_m, list_d, list_t, completed_real_trials, log, timing_log=timing_log,
+                    trajectory_log=trajectory_log)
+        print("Frame pacing:", frame_pacer.summary())
         pg.quit()
         sys.exit()
 
@@ -0,0 +1,81 @@
+import numpy as np
+import pygame as pg
+from MOT_constants import obj_radius, spatial_hash
+
+
+class HitTester:
+    """finds the object under the cursor with one numpy pass over squared distances to all centers; with grid on,
+    the objects are bucketed by cell on update and a query only looks at the cells around the cursor"""
+
+    def __init__(self, grid=spatial_hash, cell_size=2 * obj_radius):
+        self.grid = grid
+        self.cell_size = cell_size  # - at least one radius, so a hit object sits in the cursor cell or a neighbour
+        self.update([])
+
+    def update(self, mlist):
+        """take the current centers and radii of the objects"""
+        n = len(mlist)
+        self.x = np.fromiter((obj.x for obj in mlist), float, n)
+        self.y = np.fromiter((obj.y for obj in mlist), float, n)
+        self.r2 = np.fromiter((obj.radius for obj in mlist), float, n) ** 2
+        if self.grid:
+            self.cells = {}
+            cx, cy = (self.x // self.cell_size).astype(int), (self.y // self.cell_size).astype(int)
+            for k, cell in enumerate(zip(cx.tolist(), cy.tolist())):
+                self.cells.setdefault(cell, []).append(k)
+
+    def at(self, px, py):
+        """index of the object whose circle contains (px, py), the nearest one where circles overlap; -1 if none"""
+        if self.grid:
+            cx, cy = int(px // self.cell_size), int(py // self.cell_size)
+            near = [k for i in (cx - 1, cx, cx + 1) for j in (cy - 1, cy, cy + 1) for k in self.cells.get((i, j), ())]
+            if not near:
+                return -1
+            index = np.array(near)
+        else:
+            index = np.arange(len(self.x))
+            if not len(index):
+                return -1
+        d2 = (self.x[index] - px) ** 2 + (self.y[index] - py) ** 2
+        k = int(np.argmin(d2))
+        return int(index[k]) if d2[k] < self.r2[index[k]] else -1
+
+
+# == Selection state an object moves to on a mouse event, by (cursor over the object, event type) and current state;
+# == unlisted states stay as they are. "" is the state of an object that was never touched ==
+idle_states = ("", "neutral", "hovered")
+selection_transitions = {
+    (True, pg.MOUSEMOTION): dict.fromkeys(idle_states, "hovered"),
+    (True, pg.MOUSEBUTTONDOWN): dict(dict.fromkeys(idle_states, "clicked"), selected="neutral"),
+    (True, pg.MOUSEBUTTONUP): {"clicked": "selected"},
+    (False, pg.MOUSEMOTION): dict.fromkeys(idle_states, "neutral"),
+    (False, pg.MOUSEBUTTONUP): {"clicked": "neutral"},
+}
+mouse_events = (pg.MOUSEMOTION, pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP)
+
+
+def frame_input(events, mlist, hovered):
+    """input stage of one frame: mouse motion collapses to the last motion event, and the mouse events are folded
+    into every object's selection state, with one state_control call per changed object; the other events are
+    yielded in order, each after the mouse events before it have been applied"""
+    motions = [k for k, event in enumerate(events) if event.type == pg.MOUSEMOTION]
+    last_motion = motions[-1] if motions else -1
+    states = [obj.state for obj in mlist]
+
+    for k, event in enumerate(events):
+        if event.type in mouse_events:
+            if event.type == pg.MOUSEMOTION and k != last_motion:
+                continue
+            for i, state in enumerate(states):
+                states[i] = selection_transitions.get((i == hovered, event.type), {}).get(state, state)
+            continue
+        apply_states(mlist, states)
+        yield event
+        states = [obj.state for obj in mlist]  # - the caller may have changed them
+    apply_states(mlist, states)
+
+
+def apply_states(mlist, states):
+    for obj, state in zip(mlist, states):
+        if state != obj.state:
+            obj.state_control(state)
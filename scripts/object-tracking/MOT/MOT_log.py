@@ -0,0 +1,108 @@
+import os
+import time
+import queue
+import atexit
+import warnings
+import threading
+from MOT_constants import log_sync_trial, log_sync_interval
+
+# == Queue items besides text: force the written rows to disk, and stop the writer ==
+sync_marker = object()
+close_marker = object()
+
+
+class BackgroundQueue:
+    """queue worked off by a background thread, so disk I/O never stalls a frame. close() lets the thread finish
+    everything queued before it, and runs at exit too, so quitting with Esc, sys.exit or a crash loses nothing.
+    Subclasses set up what run() needs before calling __init__, which starts the thread"""
+
+    def __init__(self, name):
+        self.queue = queue.Queue()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def close(self):
+        """finish everything queued and stop; waits for the thread"""
+        if not self.closed:
+            self.closed = True
+            self.queue.put(close_marker)
+            self.thread.join()
+
+    def run(self):
+        raise NotImplementedError
+
+
+class AsyncWriter(BackgroundQueue):
+    """text file written by a background thread: write() only queues the text, and the thread writes whatever has
+    queued up in one batch. Rows are fsynced after every trial (end_trial) and at least every sync_interval seconds;
+    close() writes out the queue, syncs and closes the file"""
+
+    def __init__(self, path, mode="w", sync_trial=log_sync_trial, sync_interval=log_sync_interval):
+        self.name = path
+        self.file = open(path, mode)
+        self.sync_trial = sync_trial
+        self.sync_interval = sync_interval
+        super().__init__("writer " + path)
+
+    def write(self, text):
+        self.queue.put(text)
+
+    def end_trial(self):
+        """a trial is complete; force its rows to disk if syncing per trial"""
+        if self.sync_trial:
+            self.queue.put(sync_marker)
+
+    def run(self):
+        unsynced = False
+        last_sync = time.monotonic()
+        while True:
+            # -- Wake up for the interval sync only while there are rows that need it
+            timeout = None
+            if unsynced and self.sync_interval is not None:
+                timeout = max(self.sync_interval - (time.monotonic() - last_sync), 0)
+            try:
+                batch = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            text = "".join(item for item in batch if isinstance(item, str))
+            if text:
+                self.file.write(text)
+                unsynced = True
+            closing = close_marker in batch
+            due = self.sync_interval is not None and time.monotonic() - last_sync >= self.sync_interval
+            if unsynced and (closing or sync_marker in batch or due):
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                unsynced = False
+                last_sync = time.monotonic()
+            if closing:
+                self.file.close()
+                return
+
+
+class AsyncJobs(BackgroundQueue):
+    """functions run one after another by a background thread, e.g. to save files; a job that fails is reported as
+    a warning and the ones after it still run"""
+
+    def submit(self, what, job, *args):
+        """queue job(*args); what says what it does, for the warning if it fails"""
+        self.queue.put((what, job, args))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is close_marker:
+                return
+            what, job, args = item
+            try:
+                job(*args)
+            except Exception as error:
+                warnings.warn("{}: {} failed: {}".format(self.thread.name, what, error))
@@ -0,0 +1,195 @@
+import numpy as np
+from MOT_constants import win_width, win_height, obj_radius, spatial_hash, physics_rate, physics_dt, legacy_collisions
+
+# == Rounds of disjoint pairs collision_response resolves per step; the rest carry over to the next step ==
+max_collision_rounds = 8
+
+
+class PhysicsEngine:
+    """struct-of-arrays physics engine; moves, bounces and collides every object in one batched pass per frame"""
+
+    def __init__(self, n=0, width=win_width, height=win_height, grid=spatial_hash, cell_size=2 * obj_radius,
+                 legacy=legacy_collisions):
+        # -- Window boundary the objects bounce off
+        self.width, self.height = width, height
+        # -- Collision response; see collision_response
+        self.legacy = legacy
+        # -- Uniform grid broadphase; cells must be at least one diameter wide so touching objects are neighbours
+        self.grid = grid
+        self.cell_size = cell_size
+        self.resize(n)
+
+    def resize(self, n):
+        """allocate state arrays for n objects"""
+        self.n = n
+        self.x, self.y = np.zeros(n), np.zeros(n)
+        self.dx, self.dy = np.zeros(n), np.zeros(n)
+        self.radius = np.zeros(n)
+
+    def pull(self, mlist):
+        """copy positions, velocities and radii of the objects into the state arrays"""
+        if len(mlist) != self.n:
+            self.resize(len(mlist))
+        for i, obj in enumerate(mlist):
+            self.x[i], self.y[i] = obj.x, obj.y
+            self.dx[i], self.dy[i] = obj.dx, obj.dy
+            self.radius[i] = obj.radius
+
+    def push(self, mlist):
+        """write the stepped positions and velocities back onto the objects"""
+        for obj, x, y, dx, dy in zip(mlist, self.x.tolist(), self.y.tolist(), self.dx.tolist(), self.dy.tolist()):
+            obj.x, obj.y, obj.dx, obj.dy = x, y, dx, dy
+
+    def step(self, dt=physics_dt):
+        """advance every object by dt seconds; velocities are in px/s"""
+        self.x += self.dx * dt
+        self.y += self.dy * dt
+        self.bounce()
+        i, j = self.find_pairs()
+        self.resolve(i, j)
+
+    def bounce(self):
+        """point the velocity back into the window for every object past the boundary"""
+        r = self.radius
+        self.dx[self.x < r] = np.abs(self.dx[self.x < r])
+        self.dx[self.x > self.width - r] = -np.abs(self.dx[self.x > self.width - r])
+        self.dy[self.y < r] = np.abs(self.dy[self.y < r])
+        self.dy[self.y > self.height - r] = -np.abs(self.dy[self.y > self.height - r])
+
+    def find_pairs(self):
+        """return index arrays (i, j) of every ordered pair of touching objects, sorted by i then j"""
+        if self.grid:
+            return self.find_pairs_grid()
+        diff_x = self.x[:, None] - self.x[None, :]
+        diff_y = self.y[:, None] - self.y[None, :]
+        reach = self.radius[:, None] + self.radius[None, :]
+        hit = (diff_x * diff_x) + (diff_y * diff_y) <= (reach * reach)
+        np.fill_diagonal(hit, False)
+        return np.nonzero(hit)
+
+    def find_pairs_grid(self):
+        """same as find_pairs, but only tests objects in the same or adjacent spatial hash cells"""
+        n = self.n
+        cell = max(self.cell_size, 2 * self.radius.max(initial=0))
+        cx = np.floor(self.x / cell).astype(np.int64)
+        cy = np.floor(self.y / cell).astype(np.int64)
+        # -- Cell keys are padded by one cell on every side so neighbour keys never wrap onto another row
+        stride = int(cy.max(initial=0) - cy.min(initial=0)) + 3
+        key = (cx - cx.min(initial=0) + 1) * stride + (cy - cy.min(initial=0) + 1)
+        order = np.argsort(key, kind="stable")
+        sorted_key = key[order]
+
+        # -- For each object and each of the 9 surrounding cells, look up the run of objects in that cell
+        offsets = np.array([ox * stride + oy for ox in (-1, 0, 1) for oy in (-1, 0, 1)])
+        near_key = key[:, None] + offsets[None, :]
+        start = np.searchsorted(sorted_key, near_key, "left").ravel()
+        count = np.searchsorted(sorted_key, near_key, "right").ravel() - start
+        i = np.repeat(np.repeat(np.arange(n), len(offsets)), count)
+        run = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        j = order[np.repeat(start, count) + run]
+
+        # -- Narrow phase on the candidates only
+        diff_x = self.x[i] - self.x[j]
+        diff_y = self.y[i] - self.y[j]
+        reach = self.radius[i] + self.radius[j]
+        hit = (i != j) & ((diff_x * diff_x) + (diff_y * diff_y) <= (reach * reach))
+        i, j = i[hit], j[hit]
+        order = np.lexsort((j, i))
+        return i[order], j[order]
+
+    def resolve(self, i, j):
+        """apply the collision response to the touching pairs found by find_pairs"""
+        collision_response(self.x, self.y, self.dx, self.dy, i, j, self.legacy)
+
+
+def collision_response(x, y, dx, dy, i, j, legacy=legacy_collisions):
+    """function to resolve every touching pair of a frame in one pass; i and j are index arrays of ordered pairs
+    sorted by i, and dx, dy are updated in place.
+    legacy: object i keeps its speed and heads straight away from object j, as brownian_motion does.
+    Otherwise: equal-mass elastic collision; approaching pairs swap their velocity components along the line
+    between their centers"""
+    if not len(i):
+        return
+    if legacy:
+        # -- brownian_motion is applied pair by pair, so the last partner of each object wins
+        last = np.append(i[1:] != i[:-1], True)
+        i, j = i[last], j[last]
+        speed = np.hypot(dx[i], dy[i])
+        angle = np.arctan2(y[i] - y[j], x[i] - x[j])
+        # -- Objects at the exact same spot are pushed straight down, as brownian_motion does
+        angle[(x[i] == x[j]) & (y[i] == y[j])] = np.pi / 2
+        dx[i] = speed * np.cos(angle)
+        dy[i] = speed * np.sin(angle)
+        return
+
+    # -- Each unordered pair once
+    once = i < j
+    i, j = i[once], j[once]
+    angle = np.arctan2(y[i] - y[j], x[i] - x[j])
+    normal_x, normal_y = np.cos(angle), np.sin(angle)
+    pair = np.arange(len(i))
+    # -- Objects touching several others are resolved over a few rounds of disjoint pairs; resolving them all at
+    # once from the same velocities would add energy
+    for _ in range(max_collision_rounds):
+        closing = (dx[i] - dx[j]) * normal_x + (dy[i] - dy[j]) * normal_y
+        # -- Pairs already moving apart are left alone so overlapping objects do not stick together
+        approaching = closing < 0
+        if not approaching.any():
+            break
+        first = np.full(len(dx), len(i))
+        np.minimum.at(first, i[approaching], pair[approaching])
+        np.minimum.at(first, j[approaching], pair[approaching])
+        now = approaching & (first[i] == pair) & (first[j] == pair)
+        a, b, push = i[now], j[now], closing[now]
+        dx[a] -= push * normal_x[now]
+        dy[a] -= push * normal_y[now]
+        dx[b] += push * normal_x[now]
+        dy[b] += push * normal_y[now]
+
+
+def place_objects(n, radius=obj_radius, rng=None, width=win_width, height=win_height):
+    """function to place n objects inside the window at once, never touching each other; jittered grid where every
+    object gets its own cell and keeps a radius clear of the cell edges. Returns arrays x, y"""
+    rng = np.random.default_rng() if rng is None else rng
+    if n == 0:
+        return np.zeros(0), np.zeros(0)
+    sep = 2 * radius
+    free_w, free_h = width - sep, height - sep  # - room for the object centers
+    # -- Biggest square cell that still gives every object its own cell
+    cell = np.sqrt(free_w * free_h / n)
+    while (free_w // cell) * (free_h // cell) < n:
+        cell *= 0.95
+    if cell <= sep:
+        raise ValueError("cannot place {:d} objects of radius {:d} without overlap".format(n, radius))
+    cols, rows = int(free_w // cell), int(free_h // cell)
+    picked = rng.choice(cols * rows, n, replace=False)
+    # -- Center the grid in the window, then jitter each object inside its cell
+    x = radius + (free_w - cols * cell) / 2 + (picked % cols) * cell + radius + rng.uniform(0, cell - sep, n)
+    y = radius + (free_h - rows * cell) / 2 + (picked // cols) * cell + radius + rng.uniform(0, cell - sep, n)
+    return x, y
+
+
+class FixedTimestep:
+    """simulation clock that turns elapsed time into a whole number of fixed physics steps, so dropped or slow
+    frames do not change how far the objects move"""
+
+    def __init__(self, rate=physics_rate):
+        self.rate = rate
+        self.dt = 1 / rate
+        self.reset()
+
+    def reset(self):
+        """start counting steps from zero again"""
+        self.steps = 0
+        self.elapsed = 0
+
+    def advance(self, elapsed):
+        """return how many physics steps are due, given the seconds elapsed since the motion started"""
+        # -- Time running backwards means a new trial started
+        if elapsed < self.elapsed:
+            self.reset()
+        self.elapsed = elapsed
+        # -- Counting from the start instead of summing frame times keeps rounding errors from piling up
+        due = int(elapsed * self.rate) - self.steps
+        self.steps += due
+        return due
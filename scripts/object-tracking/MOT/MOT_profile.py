@@ -0,0 +1,83 @@
+import os
+import time
+import atexit
+import cProfile
+import warnings
+from MOT_constants import profile_env, profile_trial_env
+
+
+class StageProfiler:
+    """nanosecond counters for the named stages of the frame loop (input, physics, draw, flip). start and stop return
+    at once while profiling is off, so the calls can stay in the loop; optionally runs cProfile over one trial"""
+
+    def __init__(self, enabled=False, cprofile_trial=None):
+        self.enabled = enabled
+        self.cprofile_trial = cprofile_trial
+        self.cprofile = None
+        self.prefix = "MOT"  # - output files are written as <prefix>_profile.txt and <prefix>_trial<k>.prof
+        self.started = {}
+        self.totals = {}
+        self.calls = {}
+        atexit.register(self.write)  # - Esc, QUIT or a crash still leave the table and any running cProfile dump
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.started.clear()
+
+    def start(self, stage):
+        if self.enabled:
+            self.started[stage] = time.perf_counter_ns()
+
+    def stop(self, stage):
+        if self.enabled and stage in self.started:
+            ns = time.perf_counter_ns() - self.started.pop(stage)
+            self.totals[stage] = self.totals.get(stage, 0) + ns
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def start_trial(self, trial):
+        """start cProfile if this is the trial to profile"""
+        if self.cprofile_trial is not None and trial == self.cprofile_trial and self.cprofile is None:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def end_trial(self, trial):
+        """stop cProfile and save its stats if it ran over this trial"""
+        if self.cprofile is not None and trial == self.cprofile_trial:
+            self.cprofile.disable()
+            self.cprofile.dump_stats("{}_trial{:d}.prof".format(self.prefix, trial))
+            self.cprofile = None
+
+    def table(self):
+        """per-stage breakdown: calls, total and mean time, and share of the profiled time"""
+        total = sum(self.totals.values()) or 1
+        lines = ["{:<10} {:>10} {:>12} {:>10} {:>7}".format("stage", "calls", "total ms", "mean us", "share")]
+        for stage in sorted(self.totals, key=self.totals.get, reverse=True):
+            ns, calls = self.totals[stage], self.calls[stage]
+            lines.append("{:<10} {:>10d} {:>12.1f} {:>10.1f} {:>6.1f}%".format(
+                stage, calls, ns / 1e6, ns / calls / 1e3, 100 * ns / total))
+        return "\n".join(lines)
+
+    def write(self):
+        """write the breakdown table next to the session CSV, if anything was profiled, and save the cProfile stats
+        of a trial that was cut short"""
+        if self.cprofile is not None:
+            self.end_trial(self.cprofile_trial)
+        if self.totals:
+            with open(self.prefix + "_profile.txt", "w") as f:
+                f.write(self.table() + "\n")
+
+
+def profiler_from_env():
+    """profiler switched on by the MOT_PROFILE and MOT_PROFILE_TRIAL environment variables"""
+    trial = os.environ.get(profile_trial_env) or None
+    if trial is not None:
+        try:
+            trial = int(trial)
+        except ValueError:
+            warnings.warn("{} should be a trial number, not {!r}; no trial is profiled".format(
+                profile_trial_env, trial))
+            trial = None
+    return StageProfiler(os.environ.get(profile_env, "") not in ("", "0"), trial)
+
+
+profiler = profiler_from_env()
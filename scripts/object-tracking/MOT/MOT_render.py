@@ -0,0 +1,88 @@
+import pygame as pg
+import pygame.gfxdraw
+from MOT_profile import profiler
+from MOT_display import present
+
+
+class SpriteCache:
+    """circles rendered once per (radius, color, antialias) and kept as display-format surfaces to blit"""
+
+    def __init__(self, antialias=False):
+        self.antialias = antialias
+        self.sprites = {}
+
+    def get(self, radius, color, antialias=None):
+        antialias = self.antialias if antialias is None else antialias
+        key = (radius, tuple(color), antialias)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.sprites[key] = make_circle(radius, color, antialias)
+        return sprite
+
+
+def make_circle(radius, color, antialias=False):
+    """function to render a circle onto its own transparent surface; same pixels as pg.draw.circle at (radius, radius)"""
+    sprite = pg.Surface((2 * radius, 2 * radius), pg.SRCALPHA)
+    if antialias:
+        pg.gfxdraw.filled_circle(sprite, radius, radius, radius - 1, color)
+        pg.gfxdraw.aacircle(sprite, radius, radius, radius - 1, color)
+    else:
+        pg.draw.circle(sprite, color, (radius, radius), radius)
+    # -- Matching the display pixel format makes every later blit a plain copy
+    if pg.display.get_surface() is not None:
+        sprite = sprite.convert_alpha()
+    return sprite
+
+
+def draw_objects(display, mlist, sprites):
+    """function to draw all objects with one blits call; returns the rect each object was drawn in"""
+    return display.blits([(sprites.get(obj.radius, obj.color), (int(obj.x) - obj.radius, int(obj.y) - obj.radius))
+                          for obj in mlist])
+
+
+class DirtyRenderer:
+    """two-layer compositor: a cached static layer (background, fixation cross) with the objects blitted on top.
+    In dirty mode only the rects the objects were drawn in last frame are restored from the static layer, and only
+    those and the new rects are pushed to the display. A full repaint happens after invalidate() or a layer change"""
+
+    def __init__(self, display, sprites, painters):
+        self.display = display
+        self.sprites = sprites
+        self.painters = painters  # - static layer name -> function painting it onto a surface
+        self.layers = {}  # - static layers painted so far
+        self.rects = []  # - rects the objects were drawn in last frame
+        self.current = None  # - static layer shown last frame
+        self.full = True
+
+    def invalidate(self):
+        """make the next frame repaint and push the whole window, e.g. after a text screen was shown"""
+        self.full = True
+
+    def layer(self, name):
+        """the static layer surface, painted on first use"""
+        surface = self.layers.get(name)
+        if surface is None:
+            surface = pg.Surface(self.display.get_size()).convert(self.display)
+            self.painters[name](surface)
+            self.layers[name] = surface
+        return surface
+
+    def draw(self, mlist, layer="background", dirty=True):
+        """compose and present one frame: the static layer, then the objects"""
+        profiler.start("draw")
+        static = self.layer(layer)
+        full = self.full or not dirty or layer != self.current
+        if full:
+            self.display.blit(static, (0, 0))
+        else:
+            # -- Restore the static layer where the objects were, then draw them at their new place
+            self.display.blits([(static, rect, rect) for rect in self.rects], False)
+        rects = draw_objects(self.display, mlist, self.sprites)
+        profiler.stop("draw")
+
+        profiler.start("flip")
+        present(None if full else self.rects + rects)
+        profiler.stop("flip")
+        self.rects = rects
+        self.current = layer
+        self.full = False
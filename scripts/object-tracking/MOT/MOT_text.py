@@ -0,0 +1,63 @@
+from functools import lru_cache
+import pygame as pg
+
+# == Rendered text surfaces kept by render_text ==
+text_cache_size = 256
+
+fonts = {}  # - loaded fonts by (face, size)
+
+
+def get_font(size, face="arial"):
+    """function to load a system font once and hand out the same Font afterwards"""
+    font = fonts.get((face, size))
+    if font is None:
+        font = fonts[(face, size)] = pg.font.SysFont(face, size)
+    return font
+
+
+def preload_fonts(sizes, face="arial"):
+    """function to load fonts ahead of time, so the first screen using them does not stall on the font lookup"""
+    for size in sizes:
+        get_font(size, face)
+
+
+def render_text(text, color, size, face="arial"):
+    """function to render a line of anti-aliased text, reusing the surface if it was rendered before"""
+    return cached_render(text, tuple(color), size, face)
+
+
+@lru_cache(maxsize=text_cache_size)
+def cached_render(text, color, size, face):
+    return get_font(size, face).render(text, True, color)
+
+
+@lru_cache(maxsize=32)
+def layout_text(text, size, pos, margin, max_w, color, face="arial"):
+    """function to word-wrap a paragraph once and composite it onto a single surface; the first line starts at pos,
+    later lines at x = margin, and a word reaching max_w moves to a new line. Returns the surface and its rect"""
+    font = get_font(size, face)
+    space_w = font.size(" ")[0]
+    text_x, text_y = pos
+    placed = []  # - (surface, x, y) for every word
+    for line in text.splitlines():
+        for word in line.split(" "):
+            word_surface = render_text(word, color, size, face)
+            word_w, word_h = word_surface.get_size()
+            if text_x + word_w >= max_w:  # - the word does not fit on this line
+                text_x = margin
+                text_y += word_h
+            placed.append((word_surface, text_x, text_y))
+            text_x += word_w + space_w
+        text_x = margin
+        text_y += word_h
+
+    # -- One surface covering every word, so a frame only needs a single blit
+    left = min(x for _, x, _ in placed)
+    top = min(y for _, _, y in placed)
+    right = max(x + surface.get_width() for surface, x, _ in placed)
+    bottom = max(y + surface.get_height() for surface, _, y in placed)
+    block = pg.Surface((int(right - left) + 1, int(bottom - top) + 1), pg.SRCALPHA)
+    block.blits([(surface, (x - left, y - top)) for surface, x, y in placed])
+    if pg.display.get_surface() is not None:
+        block = block.convert_alpha()
+    return block, pg.Rect(left, top, block.get_width(), block.get_height())
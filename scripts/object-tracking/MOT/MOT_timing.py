@@ -0,0 +1,189 @@
+import sys
+import time
+import atexit
+import numpy as np
+import pygame as pg
+from MOT_constants import pacer_spin, pacer_spin_decay, frame_buffer_size
+
+# == Paced phases of a trial, the ones the frame recorder keeps; it stores their index ==
+phases = ("fixation", "flash", "animate")  # - the response phase waits on input, so has no frame rate
+
+
+def high_resolution_timer():
+    """function to ask Windows for a 1 ms timer resolution, so sleeps are not rounded up to its default ~15.6 ms tick;
+    restored at exit. Does nothing on other platforms"""
+    if sys.platform != "win32":
+        return
+    import ctypes
+    winmm = ctypes.windll.winmm
+    if winmm.timeBeginPeriod(1) == 0:  # - TIMERR_NOERROR
+        atexit.register(winmm.timeEndPeriod, 1)
+
+
+class FramePacer:
+    """keeps the trial loops at a fixed frame rate without pinning a core: sleeps until just before each frame
+    deadline and spin-waits only for the last stretch. Deadlines follow a fixed grid, so one slow frame does not shift
+    the ones after it; a frame that misses its deadline restarts the grid instead of rushing to catch up.
+    The spin margin follows the recent oversleeps of the OS: it jumps up to the latest one and decays back toward
+    spin by decay per frame, and the sleep is skipped when the margin is more than the frame has left"""
+
+    def __init__(self, fps, spin=pacer_spin, decay=pacer_spin_decay):
+        self.period = 1 / fps
+        self.min_spin = spin
+        self.spin = spin
+        self.decay = decay
+        high_resolution_timer()
+        self.reset()
+
+    def reset(self):
+        """forget the deadline grid and the statistics, e.g. before a new loop starts"""
+        self.restart()
+        self.frames = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.longest = 0.0
+        self.late = 0
+
+    def restart(self):
+        """start a new deadline grid after a pause such as a feedback screen, keeping the statistics"""
+        self.deadline = None
+        self.last = None
+
+    def tick(self):
+        """wait for the next frame deadline; returns the seconds since the previous tick"""
+        now = time.perf_counter()
+        if self.deadline is None:
+            self.deadline = now
+        else:
+            self.deadline += self.period
+            if self.deadline < now:
+                self.late += 1
+                self.deadline = now
+            else:
+                self.spin = max(self.spin * self.decay, self.min_spin)
+                wake = self.deadline - self.spin
+                if wake > now:
+                    time.sleep(wake - now)
+                    # -- Widen the spin margin if the OS overslept, so the next sleeps do not run past the deadline
+                    self.spin = max(self.spin, time.perf_counter() - wake)
+                while time.perf_counter() < self.deadline:
+                    pass
+
+        now = time.perf_counter()
+        frame = 0.0 if self.last is None else now - self.last
+        if self.last is not None:
+            self.frames += 1
+            self.total += frame
+            self.total_sq += frame * frame
+            self.longest = max(self.longest, frame)
+        self.last = now
+        return frame
+
+    def stats(self):
+        """achieved frame rate, mean frame time and its jitter (standard deviation), longest frame and missed
+        deadlines since the last reset"""
+        if not self.frames:
+            return {"fps": 0.0, "mean_ms": 0.0, "jitter_ms": 0.0, "max_ms": 0.0, "late": 0}
+        mean = self.total / self.frames
+        var = max(self.total_sq / self.frames - mean * mean, 0.0)
+        return {"fps": 1 / mean if mean else 0.0, "mean_ms": mean * 1000, "jitter_ms": var ** 0.5 * 1000,
+                "max_ms": self.longest * 1000, "late": self.late}
+
+    def summary(self):
+        return "{fps:.1f} FPS, frame {mean_ms:.2f} ms +/- {jitter_ms:.2f} ms, longest {max_ms:.2f} ms, " \
+               "{late:d} missed deadlines".format(**self.stats())
+
+
+class WallClock:
+    """real time for the trial loops; frames are paced by a FramePacer and sleeps block"""
+    virtual = False
+
+    def __init__(self, pacer):
+        self.pacer = pacer
+
+    def ticks(self):
+        """milliseconds since pygame was initialised"""
+        return pg.time.get_ticks()
+
+    def ns(self):
+        """high resolution time in nanoseconds, for response times"""
+        return time.perf_counter_ns()
+
+    def frame(self):
+        """wait for the next frame"""
+        self.pacer.tick()
+
+    def sleep(self, seconds):
+        pg.time.delay(int(seconds * 1000))
+
+
+class VirtualClock:
+    """simulated time for the trial loops: every frame advances it by a fixed dt and sleeps advance it without
+    waiting, so whole sessions run as fast as the frames can be drawn, e.g. headless for tests or stimulus generation.
+    Nothing waits for key presses while it is in use"""
+    virtual = True
+
+    def __init__(self, dt):
+        self.dt_ns = int(round(dt * 1e9))
+        self.now = 0  # - simulated nanoseconds
+
+    def ticks(self):
+        return self.now // 1000000
+
+    def ns(self):
+        return self.now
+
+    def frame(self):
+        self.now += self.dt_ns
+
+    def sleep(self, seconds):
+        self.now += int(round(seconds * 1e9))
+
+
+class FrameRecorder:
+    """always-on record of when each paced frame was presented and in which phase, kept in preallocated arrays used as
+    a ring buffer; summarises the frame times of a trial per phase. Every paced loop marks its frames right after
+    drawing them"""
+
+    def __init__(self, fps, size=frame_buffer_size):
+        self.period = 1 / fps
+        self.size = size
+        self.times = np.zeros(size, dtype=np.int64)  # - time.perf_counter_ns() after the frame was presented
+        self.phases = np.zeros(size, dtype=np.uint8)  # - index into phases
+        self.count = 0  # - frames recorded so far; frame k is in slot k % size
+        self.trial_start = 0
+
+    def mark(self, phase):
+        """record that a frame of phase has just been presented; call it straight after the flip"""
+        slot = self.count % self.size
+        self.times[slot] = time.perf_counter_ns()
+        self.phases[slot] = phases.index(phase)
+        self.count += 1
+
+    def start_trial(self):
+        """start a new trial; its summary only covers frames from here on"""
+        self.trial_start = self.count
+
+    def trial_frames(self):
+        """times and phase indices of the frames of the current trial still in the buffer, oldest first"""
+        slots = np.arange(max(self.trial_start, self.count - self.size), self.count) % self.size
+        return self.times[slots], self.phases[slots]
+
+    def summary(self):
+        """frame count, mean FPS, mean, 95th and 99th percentile and longest frame time in ms, and dropped frames
+        (refreshes missed by frames longer than one period) for each paced phase of the current trial"""
+        times, phase_index = self.trial_frames()
+        durations = np.diff(times) / 1e6  # - each frame's time since the one before, in ms
+        phase_index = phase_index[1:]
+        rows = []
+        for phase in phases:
+            frame_ms = durations[phase_index == phases.index(phase)]
+            if not len(frame_ms):
+                continue
+            mean = frame_ms.mean()
+            missed = np.round(frame_ms / (self.period * 1000)) - 1
+            rows.append({"phase": phase, "frames": len(frame_ms), "mean_fps": float(1000 / mean) if mean else 0.0,
+                         "mean_ms": float(mean), "p95_ms": float(np.percentile(frame_ms, 95)),
+                         "p99_ms": float(np.percentile(frame_ms, 99)), "max_ms": float(frame_ms.max()),
+                         "dropped": int(missed[missed > 0].sum())})
+        return rows
@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import atexit
+import hashlib
+import numpy as np
+from MOT_constants import *
+from MOT_physics import PhysicsEngine, place_objects
+from MOT_log import AsyncJobs
+
+# == Bump when a change to the physics or the seeded start makes cached trajectories stale ==
+trajectory_version = 3
+
+
+def generate_trajectory(mlist, duration=Tani - Tfl, rate=physics_rate, carry_velocities=False):
+    """function to simulate a whole motion phase ahead of time, starting from the current object positions and
+    velocities; returns a float32 array of shape (ticks + 1, objects, 2) holding x and y at every physics step.
+    With carry_velocities on, the objects are left with the velocities they end with"""
+    engine = PhysicsEngine()
+    engine.pull(mlist)
+    ticks = int(round(duration * rate))
+
+    trajectory = np.empty((ticks + 1, engine.n, 2), dtype=np.float32)
+    trajectory[0, :, 0], trajectory[0, :, 1] = engine.x, engine.y
+    for tick in range(1, ticks + 1):
+        engine.step(1 / rate)
+        trajectory[tick, :, 0], trajectory[tick, :, 1] = engine.x, engine.y
+    if carry_velocities:
+        # -- Only the velocities are written back: the objects are shown at trajectory[0] until playback starts,
+        # and the next trial moves on from the headings this one ended with
+        for obj, dx, dy in zip(mlist, engine.dx.tolist(), engine.dy.tolist()):
+            obj.dx, obj.dy = dx, dy
+    return trajectory
+
+
+def play_trajectory(trajectory, mlist, elapsed, rate=physics_rate):
+    """function to move the objects to where the trajectory has them after elapsed seconds"""
+    tick = min(int(elapsed * rate), len(trajectory) - 1)
+    for obj, (x, y) in zip(mlist, trajectory[tick].tolist()):
+        obj.x, obj.y = x, y
+
+
+def seeded_start(seed, mlist, speeds=trial_speeds):
+    """function to set the start positions and velocities of the objects from a seed"""
+    rng = np.random.default_rng(seed)
+    xs, ys = place_objects(len(mlist), rng=rng)
+    for obj, x, y in zip(mlist, xs.tolist(), ys.tolist()):
+        obj.x, obj.y = x, y
+        obj.dx, obj.dy = float(rng.choice(speeds)), float(rng.choice(speeds))
+
+
+def trajectory_params(seed, speeds=trial_speeds, duration=Tani - Tfl):
+    """everything that decides a seeded trial's trajectory; used as its cache key"""
+    return {"seed": seed, "num_targ": num_targ, "num_distractor": num_distractor, "obj_radius": obj_radius,
+            "speeds": list(speeds), "window": list(win_dimension), "duration": duration, "rate": physics_rate,
+            "legacy_collisions": legacy_collisions, "version": trajectory_version}
+
+
+class TrajectoryCache:
+    """trajectories stored as .npy files and opened memory-mapped, with a small JSON index of their parameters, size
+    and last use; the least recently used files are deleted once the cache grows past max_mb. Cache hits only update
+    the index in memory; it is written by put and at exit"""
+
+    def __init__(self, directory=trajectory_cache_dir, max_mb=trajectory_cache_mb):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self.index_path = os.path.join(directory, "index.json")
+        self.index = {}
+        self.changed = False  # - index differs from index.json
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        atexit.register(self.close)
+
+    @staticmethod
+    def key(params):
+        """hash of the parameters, used as the file name"""
+        return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def get(self, params):
+        """return the cached trajectory as a read-only memory map, or None if it is not cached"""
+        key = self.key(params)
+        entry = self.index.get(key)
+        if entry is None or entry.get("evicted"):
+            return None
+        path = os.path.join(self.directory, entry["file"])
+        if not os.path.exists(path):  # - deleted by hand
+            del self.index[key]
+            self.changed = True
+            return None
+        entry["last_used"] = time.time()
+        self.changed = True
+        return np.load(path, mmap_mode="r")
+
+    def put(self, params, trajectory):
+        """store a trajectory, then evict the least recently used ones past the size limit"""
+        os.makedirs(self.directory, exist_ok=True)
+        key = self.key(params)
+        file = key + ".npy"
+        path = os.path.join(self.directory, file)
+        # -- Write to a temporary file first so a crash never leaves a truncated .npy behind
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, trajectory)
+        os.replace(path + ".tmp", path)
+        self.index[key] = {"file": file, "bytes": os.path.getsize(path), "last_used": time.time(), "params": params}
+        self.evict()
+        self.save_index()
+
+    def evict(self):
+        """delete least recently used trajectories until the cache fits in max_bytes. A file that cannot be deleted
+        yet (still mapped, on Windows) stays in the index marked evicted, still counts towards the size, and is
+        retried first on every later eviction"""
+        total = sum(entry["bytes"] for entry in self.index.values())
+        for key in sorted(self.index, key=lambda k: (not self.index[k].get("evicted"), self.index[k]["last_used"])):
+            entry = self.index[key]
+            if total <= self.max_bytes and not entry.get("evicted"):
+                break
+            try:
+                os.remove(os.path.join(self.directory, entry["file"]))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                entry["evicted"] = True
+                continue
+            del self.index[key]
+            total -= entry["bytes"]
+
+    def save_index(self):
+        with open(self.index_path + ".tmp", "w") as f:
+            json.dump(self.index, f)
+        os.replace(self.index_path + ".tmp", self.index_path)
+        self.changed = False
+
+    def close(self):
+        """write out the last-use times of the cache hits since the index was last saved"""
+        if self.changed:
+            self.save_index()
+
+
+trajectory_cache = TrajectoryCache()
+
+
+def seeded_trajectory(seed, mlist, speeds=trial_speeds, cache=trajectory_cache):
+    """function to set the objects to the start state of a seed and return its trajectory, from the cache if there"""
+    seeded_start(seed, mlist, speeds)
+    params = trajectory_params(seed, speeds)
+    trajectory = cache.get(params)
+    if trajectory is None:
+        trajectory = generate_trajectory(mlist)
+        cache.put(params, trajectory)
+    return trajectory
+
+
+def trial_trajectory(mlist, trial=None, speeds=trial_speeds):
+    """function to get the motion of the next trial, or None to simulate it live; real trial number `trial` is seeded
+    from trial_seed_base and goes through the cache. Unseeded trials carry their end velocities into the next one"""
+    if not precompute_trajectories:
+        return None
+    if trial is None or trial_seed_base is None:
+        return generate_trajectory(mlist, carry_velocities=True)
+    return seeded_trajectory(trial_seed_base + trial, mlist, speeds)
+
+
+class TrajectoryRecorder:
+    """record of what was shown: every object's position on every animation frame, in a preallocated float32 ring
+    buffer of `size` frames. end_trial saves the trial in directory as trial_<k>.npy (frames, objects, 2), the frame
+    times in seconds since motion onset as trial_<k>_times.npy, and a JSON sidecar with the target mask; the files are
+    saved off the frame loop by AsyncJobs, and whatever is queued is saved at exit"""
+
+    def __init__(self, directory, n=num_total, size=frame_buffer_size):
+        self.directory = directory
+        self.size = size
+        self.positions = np.zeros((size, n, 2), dtype=np.float32)
+        self.times = np.zeros(size, dtype=np.float32)
+        self.count = 0  # - frames recorded this trial; frame k is in slot k % size
+        os.makedirs(directory, exist_ok=True)
+        self.saver = AsyncJobs("trajectory recorder")
+
+    def mark(self, mlist, elapsed):
+        """record the object positions of a frame shown elapsed seconds after motion onset"""
+        slot = self.count % self.size
+        self.positions[slot] = [(obj.x, obj.y) for obj in mlist]
+        self.times[slot] = elapsed
+        self.count += 1
+
+    def end_trial(self, trial, targets):
+        """hand the recorded frames of the trial to the saving thread and start over; targets is the target mask,
+        one bool per object in the order they were recorded"""
+        slots = np.arange(max(0, self.count - self.size), self.count) % self.size
+        meta = {"trial": trial, "frames": len(slots), "dropped": max(0, self.count - self.size),
+                "objects": self.positions.shape[1], "targets": [bool(t) for t in targets],
+                "target_indices": [k for k, t in enumerate(targets) if t], "obj_radius": obj_radius,
+                "window": list(win_dimension), "physics_rate": physics_rate,
+                "seed": trial_seed_base + trial if precompute_trajectories and trial_seed_base is not None else None,
+                "positions": "trial_{:04d}.npy".format(trial), "times": "trial_{:04d}_times.npy".format(trial)}
+        # -- Fancy indexing copies the frames, so the buffer can be refilled while they are saved
+        self.saver.submit("saving trial {:d}".format(trial), self.save, meta, self.positions[slots], self.times[slots])
+        self.count = 0
+
+    def close(self):
+        """save whatever is queued; waits for the saving thread"""
+        self.saver.close()
+
+    def save(self, meta, positions, times):
+        np.save(os.path.join(self.directory, meta["positions"]), positions)
+        np.save(os.path.join(self.directory, meta["times"]), times)
+        with open(os.path.join(self.directory, "trial_{:04d}.json".format(meta["trial"])), "w") as f:
+            json.dump(meta, f, indent=2)
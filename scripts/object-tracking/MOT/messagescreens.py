@@ -1,12 +1,18 @@
 import pygame as pg
-import os
 from MOT_constants import *
-
-# == Set window ==
+from MOT_physics import PhysicsEngine, FixedTimestep
+from MOT_trajectory import play_trajectory
+from MOT_render import DirtyRenderer, SpriteCache, draw_objects
+from MOT_text import render_text, layout_text
+from MOT_input import HitTester
+from MOT_profile import profiler
+from MOT_display import open_display, present, capture_hooks, FrameCapture
+
+# == Set window; offscreen when MOT_HEADLESS is set ==
 x, y = 50, 50
-os.environ['SDL_VIDEO_WINDOW_POS'] = "%d,%d" % (x,y)
-win = pg.display.set_mode((win_width, win_height), pg.FULLSCREEN)
-pg.display.set_caption(title)
+win = open_display(pos=(x, y))
+if capture_dir:
+    capture_hooks.append(FrameCapture(capture_dir))
 
 # == Define colors ==
 background_col = GREY
@@ -14,71 +20,115 @@ hover_col = DARKSLATEGREY
 click_col = GREENYELLOW
 select_col = YELLOW
 
+# == Batched physics engine used by animate() when vectorized_physics is on ==
+physics_engine = PhysicsEngine()
+physics_clock = FixedTimestep()
+
+# == Finds the object under the mouse cursor once per frame ==
+hit_tester = HitTester()
+
+# == Pre-rendered circles, and the compositor drawing them over static layers in the fixation, flash and animation phases ==
+sprite_cache = SpriteCache(antialias_circles)
+
+
+def wait_events(timeout=idle_timeout):
+    """function to sleep until an event arrives or timeout milliseconds pass; returns a list of the event that woke it,
+    if any. The events behind it stay queued for the caller to read"""
+    event = pg.event.wait(timeout)
+    if event.type == pg.NOEVENT:
+        return []
+    return [event]
+
 
 def wait_key():
     """function to wait key press"""
     while True:
-        for event in pg.event.get():
+        for event in wait_events():
             if event.type == pg.KEYDOWN and event.key == pg.K_f:
                 return
 
 
-def flash_targets(dlist, tlist):
-    """function to flash targets"""
+def flash_targets(dlist, tlist, elapsed):
+    """function to flash targets; elapsed is the time in seconds since the flashing started"""
     # pg.time.Clock().tick(FPS)
-    fixation_cross()
-    for d in dlist:
-        for t in tlist:
-            d.draw_circle(win)
-            t.flash_color()
-            t.draw_circle(win)
-    pg.display.update()
+    for t in tlist:
+        t.flash_color(elapsed)
+    renderer.draw(dlist + tlist, "fixation", dirty_rects)
 
 
-def animate(dlist, tlist, mlist):
-    """function to move or animate objects on screen"""
+def animate(dlist, tlist, mlist, vectorized=vectorized_physics, elapsed=None, trajectory=None):
+    """function to move or animate objects on screen; elapsed is the time in seconds since the objects started
+    moving, and runs as many fixed physics steps as are due by then (one step per call if not given).
+    With a precomputed trajectory the objects are placed from it instead of simulated"""
     # fixation_cross()
-    for d in dlist:
-        d.detect_collision(mlist)
-        d.draw_circle(win)
-    for t in tlist:
-        t.detect_collision(mlist)
-        t.draw_circle(win)
-    """for d in dlist:
-        for t in tlist:
-            d.detect_collision(mlist)
-            t.detect_collision(mlist)
-            d.draw_circle(win)
-            t.draw_circle(win)"""
-    pg.display.update()
+    profiler.start("physics")
+    steps = 1 if elapsed is None else physics_clock.advance(elapsed)
+    if trajectory is not None:
+        play_trajectory(trajectory, mlist, elapsed)
+    elif vectorized:
+        # -- One numpy pass for every object instead of a detect_collision call per object
+        physics_engine.pull(mlist)
+        for _ in range(steps):
+            physics_engine.step()
+        physics_engine.push(mlist)
+    else:
+        for _ in range(steps):
+            for d in dlist:
+                d.detect_collision(mlist)
+            for t in tlist:
+                t.detect_collision(mlist)
+    profiler.stop("physics")
+    renderer.draw(dlist + tlist, "background", dirty_rects)
 
 
 def static_draw(mlist):
     """function for static object draw"""
-    for obj in mlist:
-        obj.draw_circle()
+    draw_objects(win, mlist, sprite_cache)
+
+
+def response_screen(mlist, remind, drawn=None):
+    """function to present the objects for the response; only redraws when the object colors or the reminder differ
+    from `drawn`, what the previous call returned"""
+    screen = (remind, [obj.color for obj in mlist])
+    if screen != drawn:
+        win.fill(background_col)
+        if remind:
+            message_screen("not_selected_4")
+        static_draw(mlist)
+        present()
+    return screen
 
 
-def fixation_cross(color=BLACK):
+def fixation_cross(color=BLACK, display=win):
     """function to draw fixation cross"""
     start_x, end_x = ((win_width/2)-7, (win_height/2)) , ((win_width/2)+7, (win_height/2))
     start_y, end_y = (win_width/2, (win_height/2)-7), (win_width/2, (win_height/2)+7)
-    pg.draw.line(win, color, start_x, end_x, 3)
-    pg.draw.line(win, color, start_y, end_y, 3)
+    pg.draw.line(display, color, start_x, end_x, 3)
+    pg.draw.line(display, color, start_y, end_y, 3)
+
+
+def paint_background(surface):
+    """static layer of the animation phase"""
+    surface.fill(background_col)
+
+
+def paint_fixation(surface):
+    """static layer of the fixation and flash phases"""
+    surface.fill(background_col)
+    fixation_cross(BLACK, surface)
+
+
+renderer = DirtyRenderer(win, sprite_cache, {"background": paint_background, "fixation": paint_fixation})
 
 
 def fixation_screen(mlist):
     """function to present the fixation cross and the objects"""
-    fixation_cross(BLACK)
-    for obj in mlist:
-        obj.draw_circle()
-    pg.display.update()
+    renderer.draw(mlist, "fixation", dirty_rects)
 
 
 def text_objects(text, color, textsize):
     """text object defining text"""
-    msg = pg.font.SysFont("arial", textsize)
-    text_surf = msg.render(text, True, color)
+    text_surf = render_text(text, color, textsize)  # - cached; the same text is rendered only once
     return text_surf, text_surf.get_rect()  # - Returns the text surface and rect object
 
 
@@ -97,79 +147,63 @@ def msg_to_screen_centered(text, textcolor, textsize, display=win):
 
 
 def multi_line_message(text, textsize, pos=((win_width-(win_width/10)), win_height), color=BLACK, display=win):
-    """function to split text message to multiple lines and blit to display window"""
-    # -- Make a list of strings split by the "\n", and each list contains words of that line as elements
-    font = pg.font.SysFont("arial", textsize)
-    words = [word.split(" ") for word in text.splitlines()]
-
-    # -- Get the width required to render an empty space
-    space_w = font.size(" ")[0]  # .size method returns dimension in width and height. [0] gets the width
-    max_w, max_h = ((win_width-(win_width/10)), win_height)
-    text_x, text_y = pos
-
-    for line in words:
-        for word in line:
-            word_surface = font.render(word, True, color)  # get surface for each word
-            word_w, word_h = word_surface.get_size()  # get size for each word
-            if text_x + word_w >= max_w:  # if the a word exceeds the line length limit
-                text_x = (win_width/10)  # reset the x
-                text_y += word_h  # start a new row
-            display.blit(word_surface, (text_x, text_y))  # blit the text onto surface according to pos
-            text_x += word_w + space_w  # force a space between each word
-        text_x = (win_width/10)  # reset the x
-        text_y += word_h  # start a new row
-    pg.display.flip()
+    """function to split text message to multiple lines and blit to display window; the wrapped paragraph is laid
+    out once and cached, and the caller flips the display"""
+    max_w = win_width - (win_width/10)  # - lines wrap here, and restart at a tenth of the width
+    block, rect = layout_text(text, textsize, tuple(pos), win_width/10, max_w, tuple(color))
+    display.blit(block, rect)
 
 
 def message_screen(message, display=win):
     if message == "start":
         display.fill(background_col)
         multi_line_message(start_text, med_font, ((win_width - (win_width / 10)), 120))
+        present()
     if message == "not_selected_4":
         msg_to_screen_centered("Select 2 circles!", BLACK, med_font)
     if message == "timeup":
         display.fill(background_col)
         msg_to_screen_centered("Time's up! Now resetting", BLACK, large_font)
-        pg.display.flip()
+        present()
     if message == "prac_finished":
         display.fill(background_col)
         multi_line_message(prac_finished_txt, med_font, ((win_width - (win_width / 10)), 120))
-        pg.display.flip()
+        present()
     if message == "exp_finished":
         display.fill(background_col)
         multi_line_message(experim_fin_txt, large_font, ((win_width - (win_width / 10)), 150))
-        pg.display.flip()
+        present()
 
 
 def guide_screen(call, mlist, selected_targets_list):
     if call == "start":
         win.fill(background_col)
         multi_line_message(start_text, med_font, ((win_width - (win_width / 10)), 120))
-        pg.display.flip()
+        present()
     if call == "focus":
         win.fill(background_col)
         fixation_cross()
         multi_line_message(fix_text, med_font, ((win_width - (win_width / 10)), (win_height / 2 + 30)))
-        pg.display.flip()
+        present()
     if call == "present":
         win.fill(background_col)
         fixation_cross()
         static_draw(mlist)
         multi_line_message(present_text, med_font, ((win_width - (win_width / 10)), (win_height / 2 + 30)))
-        pg.display.flip()
+        present()
     if call == "answer":
         static_draw(mlist)
         multi_line_message(submit_ans_txt, med_font, ((win_width - (win_width / 10)), (win_height / 2 + 30)))
-        pg.display.flip()
+        present()
     if call == "timeup":
         win.fill(background_col)
         multi_line_message(guide_timeup_txt, med_font, ((win_width - (win_width / 10)), (win_height / 2 + 30)))
-        pg.display.flip()
+        present()
     if call == "submitted":
         win.fill(background_col)
         msg_to_screen_centered(guide_submit_txt.format(len(selected_targets_list)), BLACK, large_font)
-        pg.display.flip()
+        present()
     if call == "finished":
         win.fill(background_col)
         multi_line_message(guide_fin_txt, med_font,((win_width - (win_width / 10)), 120))
-        pg.display.flip()
+        present()
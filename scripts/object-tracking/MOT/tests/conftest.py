@@ -0,0 +1,7 @@
+import os
+import sys
+
+# == The MOT scripts import each other as top-level modules, and the tests need no screen ==
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MOT_HEADLESS", "1")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
@@ -0,0 +1,82 @@
+import math
+import numpy as np
+import pytest
+from MOT_constants import brownian_motion, obj_radius, spd_unit, win_width, win_height
+from MOT_physics import PhysicsEngine
+from MOT_exp_main import MOTobj
+
+
+def make_objects(x, y, dx, dy, radius=obj_radius):
+    mlist = []
+    for state in zip(x, y, dx, dy):
+        obj = MOTobj()
+        obj.x, obj.y, obj.dx, obj.dy = state
+        obj.radius = radius
+        mlist.append(obj)
+    return mlist
+
+
+def state(mlist):
+    return np.array([(obj.x, obj.y, obj.dx, obj.dy) for obj in mlist])
+
+
+@pytest.mark.parametrize("vertical", [False, True])
+def test_engine_matches_detect_collision(vertical):
+    # -- Each object moves along a lane of its own, so neither path has contacts; both move and bounce off the walls
+    rng = np.random.default_rng(1)
+    n = 8
+    lanes = 100 + 3 * obj_radius * np.arange(n)
+    along = rng.uniform(obj_radius, (win_height if vertical else win_width) - obj_radius, n)
+    speed = rng.choice([-2, -1, 1, 2], n) * spd_unit
+    still = np.zeros(n)
+    if vertical:
+        legacy = make_objects(lanes, along, still, speed)
+    else:
+        legacy = make_objects(along, lanes, speed, still)
+    batched = make_objects(*state(legacy).T)
+
+    engine = PhysicsEngine()
+    engine.pull(batched)
+    for _ in range(3000):  # - ~21 s of motion, several bounces per object
+        engine.step()
+        for obj in legacy:
+            obj.detect_collision(legacy)
+    engine.push(batched)
+    np.testing.assert_allclose(state(batched), state(legacy), atol=1e-6)
+    assert (state(legacy)[:, 3 if vertical else 2] != speed).any()  # - some objects are on their way back
+
+
+def test_collision_response_matches_brownian_motion():
+    # -- A crowd where most objects touch several others; the last partner of each object wins in both
+    rng = np.random.default_rng(2)
+    n = 16
+    mlist = make_objects(rng.uniform(300, 500, n), rng.uniform(300, 500, n),
+                         rng.choice([-2, -1, 1, 2], n) * spd_unit, rng.choice([-2, -1, 1, 2], n) * spd_unit)
+    engine = PhysicsEngine(legacy=True)
+    engine.pull(mlist)
+    i, j = engine.find_pairs()
+    assert len(i) > n
+    engine.resolve(i, j)
+
+    for a in mlist:
+        for b in mlist:
+            if a != b and math.sqrt((a.x - b.x) ** 2 + (a.y - b.y) ** 2) <= a.radius + b.radius:
+                brownian_motion(a, b)
+    np.testing.assert_allclose(np.column_stack([engine.dx, engine.dy]), state(mlist)[:, 2:], atol=1e-9)
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 8, 64, 512])
+@pytest.mark.parametrize("spread", [0.1, 1.0])
+def test_find_pairs_grid_matches_all_pairs(n, spread):
+    rng = np.random.default_rng(n)
+    objects = make_objects(rng.uniform(-50, spread * win_width, n), rng.uniform(-50, spread * win_height, n),
+                           np.zeros(n), np.zeros(n))
+    for obj, radius in zip(objects, rng.integers(5, 3 * obj_radius, n).tolist()):
+        obj.radius = radius  # - some wider than a grid cell
+    all_pairs, grid = PhysicsEngine(grid=False), PhysicsEngine(grid=True)
+    all_pairs.pull(objects)
+    grid.pull(objects)
+    i, j = all_pairs.find_pairs()
+    gi, gj = grid.find_pairs()
+    np.testing.assert_array_equal(gi, i)
+    np.testing.assert_array_equal(gj, j)
@@ -0,0 +1,76 @@
+import numpy as np
+import MOT_timing
+from MOT_timing import FramePacer, FrameRecorder
+
+
+class FakeTime:
+    """perf_counter that moves on a microsecond per call, and sleeps that overrun by oversleep seconds"""
+
+    def __init__(self, oversleep):
+        self.now = 0.0
+        self.oversleep = oversleep
+        self.sleeps = 0
+
+    def perf_counter(self):
+        self.now += 1e-6
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps += 1
+        self.now += seconds + self.oversleep
+
+
+def test_pacer_margin_decays_after_an_oversleep(monkeypatch):
+    fake = FakeTime(0.0)
+    monkeypatch.setattr(MOT_timing.time, "perf_counter", fake.perf_counter)
+    monkeypatch.setattr(MOT_timing.time, "sleep", fake.sleep)
+    pacer = FramePacer(144, spin=0.001, decay=0.9)
+    pacer.tick()
+    fake.oversleep = 0.004  # - one hiccup
+    pacer.tick()
+    assert pacer.spin >= 0.004
+    fake.oversleep = 0.0
+    for _ in range(100):
+        pacer.tick()
+    assert pacer.spin < 0.0011
+    assert pacer.late == 0
+
+
+def test_pacer_spins_when_sleeps_overrun_the_frame(monkeypatch):
+    fake = FakeTime(0.0156)  # - coarse timer: every sleep ends a whole tick late
+    monkeypatch.setattr(MOT_timing.time, "perf_counter", fake.perf_counter)
+    monkeypatch.setattr(MOT_timing.time, "sleep", fake.sleep)
+    pacer = FramePacer(144, spin=0.001, decay=0.99)
+    for _ in range(50):
+        pacer.tick()
+    assert fake.sleeps == 1 and pacer.late == 1  # - only the first sleep overran; later frames spin and are on time
+
+
+def test_frame_recorder_wraps_around(monkeypatch):
+    clock = iter(range(0, 10 ** 9, 1000000))  # - one frame per ms
+    monkeypatch.setattr(MOT_timing.time, "perf_counter_ns", lambda: next(clock))
+    recorder = FrameRecorder(1000, size=8)
+    for _ in range(5):
+        recorder.mark("fixation")
+    recorder.start_trial()
+    for phase in ["fixation"] * 4 + ["flash"] * 3 + ["animate"] * 5:
+        recorder.mark(phase)
+
+    times, phase_index = recorder.trial_frames()
+    assert len(times) == 8  # - the buffer only holds the last 8 of the trial's 12 frames
+    np.testing.assert_array_equal(np.diff(times), 1000000)
+    assert [MOT_timing.phases[k] for k in phase_index] == ["flash"] * 3 + ["animate"] * 5
+    rows = {row["phase"]: row for row in recorder.summary()}
+    assert rows["animate"]["frames"] == 5 and rows["animate"]["dropped"] == 0
+    assert rows["animate"]["mean_ms"] == 1.0
+
+
+def test_frame_recorder_summary_covers_the_current_trial():
+    recorder = FrameRecorder(144, size=64)
+    for _ in range(10):
+        recorder.mark("animate")
+    recorder.start_trial()
+    for _ in range(3):
+        recorder.mark("fixation")
+    assert [row["phase"] for row in recorder.summary()] == ["fixation"]
+    assert recorder.summary()[0]["frames"] == 2
@@ -0,0 +1,87 @@
+import os
+import json
+import numpy as np
+from types import SimpleNamespace
+from MOT_trajectory import TrajectoryCache, TrajectoryRecorder
+
+trajectory = np.arange(2000 * 8 * 2, dtype=np.float32).reshape(2000, 8, 2)  # - 128 KB
+
+
+def npy_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".npy"))
+
+
+def test_cache_round_trip(tmp_path):
+    cache = TrajectoryCache(str(tmp_path))
+    assert cache.get({"seed": 0}) is None
+    cache.put({"seed": 0}, trajectory)
+    hit = cache.get({"seed": 0})
+    assert isinstance(hit, np.memmap) and not hit.flags.writeable
+    np.testing.assert_array_equal(hit, trajectory)
+    assert cache.get({"seed": 1}) is None
+    # -- A new session finds it through index.json
+    np.testing.assert_array_equal(TrajectoryCache(str(tmp_path)).get({"seed": 0}), trajectory)
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = TrajectoryCache(str(tmp_path), max_mb=0.4)  # - room for three trajectories
+    for seed in range(3):
+        cache.put({"seed": seed}, trajectory)
+    cache.get({"seed": 0})
+    cache.put({"seed": 3}, trajectory)
+    assert cache.get({"seed": 1}) is None
+    for seed in (0, 2, 3):
+        assert cache.get({"seed": seed}) is not None
+    assert npy_files(tmp_path) == sorted(entry["file"] for entry in cache.index.values())
+
+
+def test_cache_hit_leaves_index_file_alone(tmp_path):
+    cache = TrajectoryCache(str(tmp_path))
+    cache.put({"seed": 0}, trajectory)
+    saved = json.load(open(cache.index_path))
+    cache.get({"seed": 0})
+    assert json.load(open(cache.index_path)) == saved
+    cache.close()
+    assert json.load(open(cache.index_path)) != saved
+
+
+def test_cache_retries_files_it_could_not_delete(tmp_path, monkeypatch):
+    cache = TrajectoryCache(str(tmp_path), max_mb=0.4)
+    for seed in range(3):
+        cache.put({"seed": seed}, trajectory)
+    stuck = cache.key({"seed": 0}) + ".npy"
+    remove = os.remove
+
+    def mapped_remove(path):
+        if path.endswith(stuck):  # - as on Windows while the file is still memory-mapped
+            raise PermissionError(path)
+        remove(path)
+
+    monkeypatch.setattr(os, "remove", mapped_remove)
+    cache.put({"seed": 3}, trajectory)
+    assert cache.get({"seed": 0}) is None
+    assert cache.index[cache.key({"seed": 0})]["evicted"]
+    assert npy_files(tmp_path) == sorted(entry["file"] for entry in cache.index.values())
+
+    monkeypatch.setattr(os, "remove", remove)
+    cache.put({"seed": 4}, trajectory)
+    assert stuck not in npy_files(tmp_path)
+    assert npy_files(tmp_path) == sorted(entry["file"] for entry in cache.index.values())
+
+
+def test_trajectory_recorder_keeps_the_last_frames(tmp_path):
+    recorder = TrajectoryRecorder(str(tmp_path), n=2, size=4)
+    objects = [SimpleNamespace(x=0.0, y=0.0), SimpleNamespace(x=0.0, y=0.0)]
+    for frame in range(6):
+        objects[0].x, objects[1].y = frame, -frame
+        recorder.mark(objects, frame / 100)
+    recorder.end_trial(3, [False, True])
+    recorder.close()
+
+    positions = np.load(os.path.join(str(tmp_path), "trial_0003.npy"))
+    times = np.load(os.path.join(str(tmp_path), "trial_0003_times.npy"))
+    meta = json.load(open(os.path.join(str(tmp_path), "trial_0003.json")))
+    np.testing.assert_array_equal(positions[:, 0, 0], [2, 3, 4, 5])  # - oldest first, after wrapping around
+    np.testing.assert_array_equal(positions[:, 1, 1], [-2, -3, -4, -5])
+    np.testing.assert_allclose(times, [0.02, 0.03, 0.04, 0.05])
+    assert meta["frames"] == 4 and meta["dropped"] == 2 and meta["target_indices"] == [1]